@@ -1,21 +1,258 @@
 #!/usr/bin/env python
+'''Save and load captures.
 
-import cPickle as pickle
+Captures are stored in a versioned binary container:
+    preamble: magic (8 bytes), version (uint16), header length (uint32)
+    header: json encoded dict (settings, meta, sample_rate, dtype, ...)
+    padding: to the next multiple of data_alignment bytes
+    data: raw little-endian sample array
 
+If saved with compression, data is instead:
+    index: n_chunks + 1 little-endian uint64 file offsets of each chunk
+    chunks: compressed chunk_samples sized blocks of the sample array
+this allows load_range to decompress only the chunks it needs.
 
-def save(capture, filename, settings=None, meta=None):
-    d = {
-        'data': capture,
-        'settings': settings,
-        'meta': meta,
-    }
-    with open(filename, 'w') as f:
-        pickle.dump(d, f)
+Old pickle files can be read with load_pickle and converted with convert.
+
+str values in settings and meta that are not valid UTF-8 (for example raw
+device id strings) are stored hex encoded as {'__bytes__': hex} and
+decoded again on load. Other strings are loaded as unicode.
+'''
+
+import bz2
+import json
+import struct
+import zlib
+
+try:
+    import lzma
+except ImportError:
+    try:
+        from backports import lzma
+    except ImportError:
+        lzma = None
+
+import numpy
+
+from . import settings as settings_module
+
+magic = 'SUMPCAP\x00'
+version = 2
+preamble = struct.Struct('<8sHI')
+data_alignment = 64
+
+# codec: (compress(data, level), decompress(data), default level)
+codecs = {
+    'zlib': (zlib.compress, zlib.decompress, 6),
+    'bz2': (bz2.compress, bz2.decompress, 9),
+}
+if lzma is not None:
+    codecs['lzma'] = (
+        lambda data, level: lzma.compress(data, preset=level),
+        lzma.decompress, 6)
+
+
+def _to_json(obj):
+    if isinstance(obj, str):
+        try:
+            obj.decode('utf-8')
+        except UnicodeDecodeError:
+            return {'__bytes__': obj.encode('hex')}
+        return obj
+    if isinstance(obj, dict):
+        return dict([
+            (k, _to_json(v)) for (k, v) in obj.iteritems()
+            if not (isinstance(k, basestring) and k.startswith('_'))])
+    if isinstance(obj, (list, tuple)):
+        return [_to_json(v) for v in obj]
+    if isinstance(obj, numpy.generic):
+        return obj.item()
+    if hasattr(obj, '__dict__'):
+        return _to_json(vars(obj))
+    return obj
+
+
+def _from_json(obj):
+    if isinstance(obj, dict):
+        if obj.keys() == ['__bytes__']:
+            return str(obj['__bytes__']).decode('hex')
+        return dict([(k, _from_json(v)) for (k, v) in obj.iteritems()])
+    if isinstance(obj, list):
+        return [_from_json(v) for v in obj]
+    return obj
+
+
+def settings_to_dict(settings):
+    '''Convert a settings object to a json compatible dict.'''
+    if settings is None:
+        return None
+    d = _to_json(settings)
+    if isinstance(settings, settings_module.Settings):
+        d['__class__'] = 'sump.settings.Settings'
+    return d
+
+
+def settings_from_dict(d):
+    '''Rebuild sump.settings.Settings, other settings are returned as dicts.'''
+    if d is None or d.get('__class__', None) != 'sump.settings.Settings':
+        return d
+    d = dict([(str(k), v) for (k, v) in d.iteritems() if k != '__class__'])
+    stages = d.pop('trigger_stages', [])
+    s = settings_module.Settings(**d)
+    s.trigger_stages = [
+        settings_module.TriggerStage(
+            **dict([(str(k), v) for (k, v) in t.iteritems()]))
+        for t in stages]
+    return s
+
+
+def save(
+        capture, filename, settings=None, meta=None, sample_rate=None,
+        compression=None, level=None, chunk_samples=65536):
+    '''Save a capture.
+
+    compression can be None (raw samples) or one of codecs ('zlib', 'bz2'
+    and, if available, 'lzma') to compress the samples in chunk_samples
+    sized chunks at level (None for the codec default).'''
+    if not isinstance(capture, numpy.ndarray):
+        capture = numpy.asarray(capture, dtype=numpy.uint32)
+    capture = capture.astype(capture.dtype.newbyteorder('<'), copy=False)
+    if sample_rate is None:
+        sample_rate = getattr(settings, 'sample_rate', None)
+    if compression is not None:
+        if compression not in codecs:
+            raise ValueError("Unknown compression: %s" % (compression, ))
+        compress, _, default_level = codecs[compression]
+        if level is None:
+            level = default_level
+        n_chunks = -(-len(capture) // chunk_samples)
+        compression = {
+            'codec': compression, 'level': level,
+            'chunk_samples': chunk_samples, 'n_chunks': n_chunks}
+    header = json.dumps({
+        'dtype': capture.dtype.str,
+        'n_samples': len(capture),
+        'sample_rate': sample_rate,
+        'settings': settings_to_dict(settings),
+        'meta': _to_json(meta),
+        'compression': compression,
+    })
+    offset = preamble.size + len(header)
+    padding = -offset % data_alignment
+    with open(filename, 'wb') as f:
+        f.write(preamble.pack(magic, version, len(header)))
+        f.write(header)
+        f.write('\x00' * padding)
+        if compression is None:
+            capture.tofile(f)
+            return
+        index = numpy.zeros(n_chunks + 1, dtype='<u8')
+        index[0] = offset + padding + index.nbytes
+        f.seek(index[0])
+        for i in xrange(n_chunks):
+            chunk = capture[i * chunk_samples:(i + 1) * chunk_samples]
+            f.write(compress(
+                numpy.ascontiguousarray(chunk).tostring(), level))
+            index[i + 1] = f.tell()
+        f.seek(offset + padding)
+        index.tofile(f)
     return
 
 
-def load(filename):
-    with open(filename, 'r') as f:
+def _read_header(f):
+    p = f.read(preamble.size)
+    if len(p) != preamble.size:
+        raise IOError("Not a capture file [too short]")
+    m, v, n = preamble.unpack(p)
+    if m != magic:
+        raise IOError("Not a capture file [invalid magic]")
+    if v > version:
+        raise IOError("Unsupported capture file version %s" % (v, ))
+    header = _from_json(json.loads(f.read(n)))
+    offset = preamble.size + n
+    header['version'] = v
+    header['data_offset'] = offset + (-offset % data_alignment)
+    return header
+
+
+def load_header(filename):
+    '''Read only the header (settings, meta, sample_rate, ...).'''
+    with open(filename, 'rb') as f:
+        return _read_header(f)
+
+
+def load(filename, mmap=False):
+    '''Load a capture, returning (data, settings, meta).
+
+    If mmap is True data is a read-only numpy.memmap of the file, samples
+    are only read from disk (and shared through the page cache between
+    processes) when they are accessed. Compressed captures can not be
+    memory mapped.'''
+    with open(filename, 'rb') as f:
+        header = _read_header(f)
+        dtype = numpy.dtype(str(header['dtype']))
+        if header.get('compression', None) is not None:
+            if mmap:
+                raise ValueError("Compressed captures can not be mmapped")
+            data = _read_chunks(f, header, 0, header['n_samples'])
+        elif mmap and header['n_samples']:
+            data = numpy.memmap(
+                f, dtype=dtype, mode='r', offset=header['data_offset'],
+                shape=(header['n_samples'], ))
+        else:
+            f.seek(header['data_offset'])
+            data = numpy.fromfile(f, dtype=dtype, count=header['n_samples'])
+    # parse out settings and data
+    return (
+        data, settings_from_dict(header['settings']), header['meta'])
+
+
+def _read_chunks(f, header, start, stop):
+    c = header['compression']
+    decompress = codecs[c['codec']][1]
+    dtype = numpy.dtype(str(header['dtype']))
+    f.seek(header['data_offset'])
+    index = numpy.fromfile(f, dtype='<u8', count=c['n_chunks'] + 1)
+    n = c['chunk_samples']
+    data = numpy.empty(stop - start, dtype=dtype)
+    for i in xrange(start // n, -(-stop // n)):
+        f.seek(index[i])
+        chunk = numpy.frombuffer(
+            decompress(f.read(index[i + 1] - index[i])), dtype=dtype)
+        # overlap of chunk [i * n, (i + 1) * n) with [start, stop)
+        s = max(start, i * n)
+        e = min(stop, (i + 1) * n)
+        data[s - start:e - start] = chunk[s - i * n:e - i * n]
+    return data
+
+
+def load_range(filename, start, stop):
+    '''Load samples [start:stop) of a capture.
+
+    For compressed captures only the chunks covering the range are read
+    and decompressed.'''
+    with open(filename, 'rb') as f:
+        header = _read_header(f)
+        n_samples = header['n_samples']
+        start, stop, _ = slice(start, stop).indices(n_samples)
+        stop = max(start, stop)
+        if header.get('compression', None) is not None:
+            return _read_chunks(f, header, start, stop)
+        dtype = numpy.dtype(str(header['dtype']))
+        f.seek(header['data_offset'] + start * dtype.itemsize)
+        return numpy.fromfile(f, dtype=dtype, count=stop - start)
+
+
+def load_pickle(filename):
+    '''Load an old pickle capture file (only load trusted files).'''
+    import cPickle as pickle
+    with open(filename, 'rb') as f:
         d = pickle.load(f)
     # parse out settings and data
     return d['data'], d.get('settings', None), d.get('meta', None)
+
+
+def convert(pickle_filename, filename):
+    '''Convert an old pickle capture file to a binary capture file.'''
+    data, settings, meta = load_pickle(pickle_filename)
+    save(data, filename, settings, meta)
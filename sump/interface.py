@@ -4,9 +4,14 @@
 
 import logging
 import struct
+import time
 
+import numpy
 import serial
 
+from sump2.ops import raw
+from sump2.settings import max_short_count
+
 from . import errors
 from . import fio
 from . import ops
@@ -24,7 +29,16 @@ class Interface(object):
 
     def __init__(
             self, path='/dev/ttyACM0', baud=115200,
-            timeout=None, settings=None, **kwargs):
+            timeout=None, settings=None, metadata_cache=None, **kwargs):
+        '''metadata_cache can be None (always query, the default), True
+        (use the default on disk cache) or a
+        sump2.devices.cache.MetadataCache.'''
+        self.path = path
+        self.metadata_cache = None
+        if metadata_cache:
+            # sump2 is only needed when the cache is used
+            from sump2.devices import cache
+            self.metadata_cache = cache.resolve(metadata_cache)
         self.timeout = timeout
         if settings is None:
             self.settings = settings_module.Settings(**kwargs)
@@ -36,18 +50,61 @@ class Interface(object):
         self.port = serial.Serial(path, baud, timeout=self.timeout)
         self.debug_logger = None
         self.reset()
-        self.metadata = self.query_metadata()
+        self.metadata = self.load_metadata()
+        if self.deep_memory():
+            self.settings.extended_counts = True
         self.send_settings()
 
+    def load_metadata(self, refresh=False):
+        '''Return metadata from the metadata cache or (if missing or
+        refresh is True) by querying the device.'''
+        if self.metadata_cache is None:
+            return self.query_metadata()
+        timeout = self.port.timeout  # save timeout setting to restore later
+        try:
+            # as in query_metadata, only wait 2 seconds for the device
+            self.port.timeout = 2
+            id_string = self.id_string()
+        finally:
+            self.port.timeout = timeout  # restore timeout setting
+        if len(id_string) != 4:
+            # no (complete) id, can't look up the cache
+            return self.query_metadata()
+        key = (id_string, self.path)
+        if not refresh:
+            md = self.metadata_cache.get(key[0], key[1], 'sump')
+            if md is not None:
+                return [tuple(i) for i in md]
+        md = self.query_metadata()
+        self.metadata_cache.set(key[0], key[1], md, 'sump')
+        return md
+
+    def deep_memory(self):
+        '''True if the metadata reports more sample memory than the
+        16-bit read/delay count command can address.'''
+        for (token, value) in self.metadata:
+            if (
+                    token in (0x21, 0x22) and
+                    value > max_short_count):
+                return True
+        return False
+
     def reset(self):
         logger.debug("reset")
         self.port.write('\x00\x00\x00\x00\x00')
 
-    def capture(self, send_settings=True):
-        '''Request a capture.'''
+    def capture(self, send_settings=True, as_array=False, chunk_samples=65536):
+        '''Request a capture.
+
+        By default the capture is returned as a list of ints. If as_array
+        is True the capture is read chunk_samples at a time and returned
+        as a uint32 numpy array (reversed as a view if
+        settings.latest_first).'''
         logger.debug("capture")
         if send_settings:
             self.send_settings()
+        if as_array:
+            return self._capture_array(chunk_samples)
         # get local references to objects for faster execution ..
         logger.debug("building unpack functions")
         ufs = []
@@ -72,6 +129,60 @@ class Interface(object):
         else:
             return d
 
+    def _capture_array(self, chunk_samples=65536):
+        offsets = raw.group_offsets(self.settings.channel_groups)
+        n_samples = self.settings.read_count
+        d = numpy.empty(n_samples, dtype=numpy.uint32)
+        self.port.timeout = self.settings.timeout
+        logger.debug("starting capture")
+        self.port.write('\x01')  # start the capture
+        logger.debug("reading capture")
+        for i in xrange(0, n_samples, chunk_samples):
+            n = min(chunk_samples, n_samples - i)
+            raw.unpack_samples(
+                raw.read_bytes(self.port, n * len(offsets)), offsets,
+                out=d[i:i + n])
+        if self.settings.latest_first:
+            return d[::-1]
+        return d
+
+    def capture_iter(self, chunk_samples=1024, send_settings=True):
+        '''Request a capture, yielding (offset, chunk) as samples arrive.
+
+        Chunks are uint32 numpy arrays yielded in the order they are read.
+        If settings.latest_first is True (the device sends the newest
+        sample first) each chunk is reversed (as a view) and offset counts
+        down, otherwise offset counts up from 0. In both cases
+        out[offset:offset + len(chunk)] = chunk builds the same array
+        as capture().'''
+        logger.debug("capture_iter")
+        if send_settings:
+            self.send_settings()
+        offsets = raw.group_offsets(self.settings.channel_groups)
+        n_samples = self.settings.read_count
+        self.port.timeout = self.settings.timeout
+        logger.debug("starting capture")
+        self.port.write('\x01')  # start the capture
+        i = 0
+        try:
+            while i < n_samples:
+                n = min(chunk_samples, n_samples - i)
+                d = raw.unpack_samples(
+                    raw.read_bytes(self.port, n * len(offsets)), offsets)
+                if self.settings.latest_first:
+                    yield n_samples - i - n, d[::-1]
+                else:
+                    yield i, d
+                i += n
+        finally:
+            if i < n_samples:
+                # stopped early, abort the rest of the transfer and
+                # discard what was already received
+                self.reset()
+                while self.port.inWaiting():
+                    self.port.flushInput()
+                    time.sleep(0.1)
+
     def save(self, capture, filename, meta=None):
         logger.debug("save %s", filename)
         fio.save(capture, filename, self.settings, meta)
@@ -160,7 +271,11 @@ class Interface(object):
         #d = (settings.delay_count + 3) >> 2
         d = (settings.delay_count // 4)
         settings.delay_count = d * 4
-        msg = struct.pack('<cHH', '\x81', r, d)
+        if settings.extended_counts:
+            # separate 32-bit read and delay count commands
+            msg = struct.pack('<cI', '\x84', r) + struct.pack('<cI', '\x83', d)
+        else:
+            msg = struct.pack('<cHH', '\x81', r, d)
         self.port.write(msg)
         #w = self.port.write
         ##w = self._trace_control('Read/Delay')
@@ -22,6 +22,7 @@ class Settings(object):
         self.divider = 2
         self.read_count = 6140
         self.delay_count = 2048
+        self.extended_counts = False
         self.external = False
         self.inverted = False
         self.filter = False
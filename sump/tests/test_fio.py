@@ -0,0 +1,138 @@
+#!/usr/bin/env python
+
+import cPickle as pickle
+import os
+import shutil
+import tempfile
+import unittest
+
+import numpy
+
+from sump import fio
+from sump import settings
+
+
+class FioTest(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.filename = os.path.join(self.dir, 'capture.cap')
+        self.data = numpy.arange(1000, dtype='uint32') * 0x01010101
+        self.settings = settings.Settings(
+            divider=4, read_count=1000, channel_groups=0b0010)
+        self.settings.trigger_stages = [
+            settings.TriggerStage(mask=0xFF, value=0x12, level=1)]
+        self.meta = {'id': '\x00\xff1A', 'name': 'test', 'n': 3}
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+
+    def check_settings(self, s):
+        self.assertTrue(isinstance(s, settings.Settings))
+        self.assertEqual(s.divider, 4)
+        self.assertEqual(s.channel_groups, 0b0010)
+        self.assertEqual(s.sample_rate, self.settings.sample_rate)
+        self.assertEqual(len(s.trigger_stages), 1)
+        self.assertEqual(s.trigger_stages[0].mask, 0xFF)
+        self.assertEqual(s.trigger_stages[0].value, 0x12)
+
+    def test_round_trip(self):
+        fio.save(self.data, self.filename, self.settings, self.meta)
+        data, s, meta = fio.load(self.filename)
+        self.assertEqual(data.dtype, self.data.dtype)
+        self.assertTrue((data == self.data).all())
+        self.check_settings(s)
+        self.assertEqual(meta, self.meta)
+        self.assertEqual(type(meta['id']), str)
+
+    def test_mmap(self):
+        fio.save(self.data, self.filename, self.settings)
+        data, s, meta = fio.load(self.filename, mmap=True)
+        self.assertTrue(isinstance(data, numpy.memmap))
+        self.assertTrue((data == self.data).all())
+        self.assertEqual(meta, None)
+
+    def test_list_capture(self):
+        fio.save([1, 2, 3], self.filename)
+        data, s, meta = fio.load(self.filename)
+        self.assertEqual(list(data), [1, 2, 3])
+        self.assertEqual(s, None)
+
+    def test_load_header(self):
+        fio.save(self.data, self.filename, self.settings, self.meta)
+        header = fio.load_header(self.filename)
+        self.assertEqual(header['version'], fio.version)
+        self.assertEqual(header['n_samples'], len(self.data))
+        self.assertEqual(header['sample_rate'], self.settings.sample_rate)
+        self.assertEqual(header['meta'], self.meta)
+        self.assertEqual(header['data_offset'] % fio.data_alignment, 0)
+
+    def test_load_range(self):
+        fio.save(self.data, self.filename)
+        for (start, stop) in [(0, 10), (500, 1000), (990, 2000), (5, 5)]:
+            self.assertEqual(
+                list(fio.load_range(self.filename, start, stop)),
+                list(self.data[start:stop]))
+
+    def test_convert(self):
+        old = os.path.join(self.dir, 'old.p')
+        with open(old, 'wb') as f:
+            pickle.dump({
+                'data': list(self.data), 'settings': self.settings,
+                'meta': self.meta}, f)
+        fio.convert(old, self.filename)
+        data, s, meta = fio.load(self.filename)
+        self.assertTrue((data == self.data).all())
+        self.check_settings(s)
+        self.assertEqual(meta, self.meta)
+
+    def test_compressed(self):
+        for codec in sorted(fio.codecs):
+            fio.save(
+                self.data, self.filename, self.settings, self.meta,
+                compression=codec, chunk_samples=64)
+            header = fio.load_header(self.filename)
+            self.assertEqual(header['compression']['codec'], codec)
+            self.assertEqual(header['compression']['n_chunks'], 16)
+            data, s, meta = fio.load(self.filename)
+            self.assertTrue((data == self.data).all())
+            self.check_settings(s)
+            self.assertEqual(meta, self.meta)
+            self.assertRaises(
+                ValueError, fio.load, self.filename, mmap=True)
+
+    def test_compressed_load_range(self):
+        fio.save(
+            self.data, self.filename, compression='zlib', chunk_samples=64)
+        ranges = [
+            (0, 64), (63, 65), (64, 128), (100, 300), (0, 1000),
+            (960, 1000), (999, 1000), (900, 5000), (-10, None), (10, 10),
+            (20, 10)]
+        for (start, stop) in ranges:
+            self.assertEqual(
+                list(fio.load_range(self.filename, start, stop)),
+                list(self.data[start:stop]), (start, stop))
+
+    def test_empty(self):
+        data = numpy.zeros(0, dtype='uint32')
+        for compression in (None, 'zlib'):
+            fio.save(data, self.filename, compression=compression)
+            d, s, meta = fio.load(self.filename)
+            self.assertEqual(len(d), 0)
+            self.assertEqual(d.dtype, data.dtype)
+            self.assertEqual(len(fio.load_range(self.filename, 0, 10)), 0)
+        fio.save(data, self.filename)
+        self.assertEqual(len(fio.load(self.filename, mmap=True)[0]), 0)
+
+    def test_unknown_codec(self):
+        self.assertRaises(
+            ValueError, fio.save, self.data, self.filename,
+            compression='rar')
+
+    def test_invalid(self):
+        with open(self.filename, 'wb') as f:
+            f.write('not a capture file')
+        self.assertRaises(IOError, fio.load, self.filename)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,83 @@
+#!/usr/bin/env python
+
+import logging
+import os
+import shutil
+import tempfile
+import unittest
+
+from sump import interface
+from sump2.devices import cache
+
+
+class FakePort(object):
+    """Serial port answering id and metadata requests"""
+    id_string = '1ALS'[::-1]
+
+    def __init__(self, path, baud, timeout=None):
+        self.timeout = timeout
+        self.rx = ''
+        # port timeout when each request was received
+        self.timeouts = {}
+
+    def write(self, s):
+        self.timeouts[s] = self.timeout
+        if s == '\x02':
+            self.rx += self.id_string
+        elif s == '\x04':
+            self.rx += '\x01OLS\x00\x21\x00\x00\x60\x00\x00'
+
+    def read(self, n=1):
+        r, self.rx = self.rx[:n], self.rx[n:]
+        return r
+
+    def inWaiting(self):
+        return len(self.rx)
+
+    def flushInput(self):
+        self.rx = ''
+
+    def close(self):
+        pass
+
+
+class MetadataTest(unittest.TestCase):
+    def setUp(self):
+        self.serial = interface.serial.Serial
+        interface.serial.Serial = FakePort
+        interface.logger.setLevel(logging.WARNING)
+        self.dir = tempfile.mkdtemp()
+        self.cache = cache.MetadataCache(
+            os.path.join(self.dir, 'metadata.json'))
+
+    def tearDown(self):
+        interface.serial.Serial = self.serial
+        interface.logger.setLevel(logging.DEBUG)
+        shutil.rmtree(self.dir)
+
+    def test_id_timeout(self):
+        i = interface.Interface(metadata_cache=self.cache)
+        # the id is read with the same 2 second timeout as the metadata
+        self.assertEqual(i.port.timeouts['\x02'], 2)
+        self.assertEqual(i.port.timeouts['\x04'], 2)
+        self.assertEqual(i.port.timeout, None)
+        self.assertEqual(i.metadata, [(1, 'OLS'), (0x21, 0x6000)])
+
+    def test_cached(self):
+        interface.Interface(metadata_cache=self.cache)
+        i = interface.Interface(metadata_cache=self.cache)
+        self.assertFalse('\x04' in i.port.timeouts)
+        self.assertEqual(i.metadata, [(1, 'OLS'), (0x21, 0x6000)])
+
+    def test_no_id(self):
+        FakePort.id_string = ''
+        try:
+            i = interface.Interface(metadata_cache=self.cache)
+        finally:
+            FakePort.id_string = '1ALS'[::-1]
+        self.assertEqual(i.metadata, [(1, 'OLS'), (0x21, 0x6000)])
+        self.assertEqual(self.cache._load(), {})
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,58 @@
+#!/usr/bin/env python
+"""
+Bit-plane (1 bit per sample per channel) capture storage
+
+Each channel is stored as a numpy.packbits array, padding bits (past
+n_samples) are always 0 so popcount, xor and and of planes are exact.
+"""
+
+import numpy
+
+from ..ops import parse
+
+
+popcount_table = numpy.array(
+    [bin(i).count('1') for i in xrange(256)], dtype=numpy.uint8)
+
+
+def popcount(plane):
+    """Number of set bits in a packed plane"""
+    return int(popcount_table[plane].sum(dtype='int64'))
+
+
+class BitPlanes(object):
+    def __init__(self, data, n_channels=None):
+        data = parse.as_unsigned(data)
+        if n_channels is None:
+            n_channels = data.dtype.itemsize * 8
+        self.n_samples = len(data)
+        self.n_channels = n_channels
+        self.planes = numpy.empty(
+            (n_channels, (self.n_samples + 7) // 8), dtype=numpy.uint8)
+        tmp = numpy.empty_like(data)
+        for ch in xrange(n_channels):
+            numpy.right_shift(data, ch, out=tmp)
+            numpy.bitwise_and(tmp, 0b1, out=tmp)
+            self.planes[ch] = numpy.packbits(tmp.astype(numpy.uint8))
+
+    def unpack(self, plane):
+        """Unpack a packed plane to a bool array of n_samples"""
+        return numpy.unpackbits(plane)[:self.n_samples].astype(bool)
+
+    def channel(self, ch):
+        return self.unpack(self.planes[ch])
+
+    def count(self, ch):
+        """Number of samples where channel ch is high"""
+        return popcount(self.planes[ch])
+
+    def duty_cycle(self, ch):
+        return self.count(ch) / float(self.n_samples)
+
+    def xor(self, a, b):
+        """Packed plane of samples where channels a and b differ"""
+        return numpy.bitwise_xor(self.planes[a], self.planes[b])
+
+    def and_(self, a, b):
+        """Packed plane of samples where channels a and b are both high"""
+        return numpy.bitwise_and(self.planes[a], self.planes[b])
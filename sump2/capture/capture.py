@@ -6,26 +6,71 @@ Capture
     data by member
     data by group
     filters/operations
+
+fields are specified as in sump2.ops.parse, each field is computed on
+first access and cached (least recently used fields are evicted when
+more than max_cached fields are cached).
+
+transitions is a (lazily built) sump2.ops.edges.TransitionIndex of raw
+and bitplanes a (lazily built) BitPlanes of raw.
 """
 
+import collections
+
+from ..ops import edges
+from ..ops import parse
+from . import bitplanes
+
 
 class Capture(object):
-    def __init__(self, data, settings):
+    def __init__(self, data, settings, fields=None, max_cached=None):
         self.settings = settings
         self.raw = data
-        self._parse_data()
+        if fields is None:
+            fields = {}
+        self.fields = fields
+        self.max_cached = max_cached
+        self._cache = collections.OrderedDict()
+        self._transitions = None
+        self._bitplanes = None
 
-    def _parse_data(self):
-        # TODO
-        self._data_by_sample = self.raw
-        self._data_by_key = self.raw
+    @property
+    def transitions(self):
+        if self._transitions is None:
+            self._transitions = edges.TransitionIndex(self.raw)
+        return self._transitions
+
+    @property
+    def bitplanes(self):
+        if self._bitplanes is None:
+            self._bitplanes = bitplanes.BitPlanes(self.raw)
+        return self._bitplanes
+
+    def _field(self, key):
+        if key in self._cache:
+            v = self._cache.pop(key)
+            self._cache[key] = v  # mark as most recently used
+            return v
+        if key not in self.fields:
+            raise KeyError("Unknown field %s" % (key, ))
+        v = parse.unpack(self.raw, self.fields[key])
+        self._cache[key] = v
+        if self.max_cached is not None:
+            while len(self._cache) > self.max_cached:
+                self._cache.popitem(last=False)
+        return v
+
+    def evict(self, key=None):
+        """Drop a cached field (or all cached fields if key is None)"""
+        if key is None:
+            self._cache.clear()
+        else:
+            self._cache.pop(key, None)
 
     def __getitem__(self, key):
-        if isinstance(key, int):
-            print "_data_by_sample"
-            return self._data_by_sample[key]
+        if isinstance(key, (int, long)):
+            return self.raw[key]
         elif isinstance(key, (str, unicode)):
-            print "_data_by_key"
-            return self._data_by_key[key]
+            return self._field(key)
         else:
             raise TypeError("Invalid __getitem__ type %s" % type(key))
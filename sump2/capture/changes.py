@@ -0,0 +1,65 @@
+#!/usr/bin/env python
+"""
+Transition only (change list) capture representation
+
+Only the sample index and new value of each change are stored:
+    indices: sample index of each change (indices[0] == 0)
+    values: value from indices[i] up to indices[i + 1]
+    n_samples: number of samples in the dense capture
+"""
+
+import numpy
+
+
+class ChangeList(object):
+    def __init__(self, indices, values, n_samples):
+        self.indices = numpy.asarray(indices, dtype='int64')
+        self.values = numpy.asarray(values)
+        self.n_samples = n_samples
+
+    @classmethod
+    def from_dense(cls, data):
+        data = numpy.asarray(data)
+        if not len(data):
+            return cls([], data, 0)
+        indices = numpy.flatnonzero(data[1:] != data[:-1]) + 1
+        indices = numpy.concatenate(([0], indices))
+        return cls(indices, data[indices], len(data))
+
+    def to_dense(self):
+        durations = numpy.diff(numpy.append(self.indices, self.n_samples))
+        return numpy.repeat(self.values, durations)
+
+    def compact(self):
+        """Drop changes to the same value"""
+        if not len(self.values):
+            return self
+        keep = numpy.ones(len(self.values), dtype=bool)
+        keep[1:] = self.values[1:] != self.values[:-1]
+        return ChangeList(
+            self.indices[keep], self.values[keep], self.n_samples)
+
+    def value_at(self, i):
+        if i < 0:
+            i += self.n_samples
+        if i < 0 or i >= self.n_samples:
+            raise IndexError("index %s out of range" % (i, ))
+        return self.values[numpy.searchsorted(self.indices, i, 'right') - 1]
+
+    def __len__(self):
+        return self.n_samples
+
+    def __getitem__(self, key):
+        if isinstance(key, slice):
+            start, stop, step = key.indices(self.n_samples)
+            if step != 1:
+                raise ValueError("ChangeList slices must have a step of 1")
+            stop = max(start, stop)
+            if start == stop:
+                return ChangeList([], self.values[:0], 0)
+            i = numpy.searchsorted(self.indices, start, 'right') - 1
+            j = numpy.searchsorted(self.indices, stop, 'left')
+            indices = self.indices[i:j] - start
+            indices[0] = 0
+            return ChangeList(indices, self.values[i:j], stop - start)
+        return self.value_at(key)
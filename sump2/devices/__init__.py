@@ -1,6 +1,10 @@
 #!/usr/bin/env python
 
+from . import cache
+from . import multi
+from . import nonblocking
 from . import ols
 from . import rs232
+from . import segmented
 
-__all__ = ['ols', 'rs232']
+__all__ = ['cache', 'multi', 'nonblocking', 'ols', 'rs232', 'segmented']
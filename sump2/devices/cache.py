@@ -0,0 +1,98 @@
+#!/usr/bin/env python
+"""
+On disk device metadata cache
+
+Entries are keyed by device identity (id string and port) and the
+format of the metadata (kind, 'ols' for sump2.devices.ols.OLS and 'sump'
+for sump.Interface) and expire after ttl seconds. The cache is a json
+file (default_path) rewritten atomically on every change.
+
+Devices running the same firmware report the same id string, so
+entries are effectively keyed by port: invalidate the entry (or use
+refresh) after swapping the board on a port.
+"""
+
+import json
+import logging
+import os
+import time
+
+
+default_path = os.path.join(
+    os.path.expanduser('~'), '.pysump', 'metadata.json')
+default_ttl = 7 * 24 * 60 * 60
+
+logger = logging.getLogger(__name__)
+
+
+class MetadataCache(object):
+    def __init__(self, path=None, ttl=None):
+        if path is None:
+            path = default_path
+        if ttl is None:
+            ttl = default_ttl
+        self.path = path
+        self.ttl = ttl
+
+    def key(self, id_string, port, kind='ols'):
+        return '%s:%s@%s' % (kind, id_string.encode('hex'), port)
+
+    def _load(self):
+        if not os.path.exists(self.path):
+            return {}
+        try:
+            with open(self.path, 'r') as f:
+                return json.load(f)
+        except (IOError, ValueError) as e:
+            logger.warning("Failed to read %s: %s", self.path, e)
+            return {}
+
+    def _save(self, entries):
+        d = os.path.dirname(self.path)
+        if d and not os.path.exists(d):
+            os.makedirs(d)
+        tmp = '%s.%i.tmp' % (self.path, os.getpid())
+        with open(tmp, 'w') as f:
+            json.dump(entries, f)
+        os.rename(tmp, self.path)
+
+    def get(self, id_string, port, kind='ols'):
+        """Cached metadata, None if missing or expired"""
+        e = self._load().get(self.key(id_string, port, kind), None)
+        if e is None or (time.time() - e['time']) > self.ttl:
+            return None
+        logger.debug("MetadataCache hit %s %s", id_string, port)
+        return e['metadata']
+
+    def set(self, id_string, port, metadata, kind='ols'):
+        entries = self._load()
+        entries[self.key(id_string, port, kind)] = {
+            'time': time.time(), 'metadata': metadata}
+        self._save(entries)
+
+    def invalidate(self, id_string=None, port=None, kind=None):
+        """
+        Drop the entries for a device (of one kind or all kinds)
+        or all entries if id_string is None
+        """
+        if id_string is None:
+            entries = {}
+        else:
+            entries = self._load()
+            if kind is None:
+                suffix = self.key(id_string, port, '')
+                for k in entries.keys():
+                    if k.endswith(suffix):
+                        del entries[k]
+            else:
+                entries.pop(self.key(id_string, port, kind), None)
+        self._save(entries)
+
+
+def resolve(metadata_cache):
+    """True for the default cache, None/False for no cache"""
+    if metadata_cache is True:
+        return MetadataCache()
+    if not metadata_cache:
+        return None
+    return metadata_cache
@@ -0,0 +1,89 @@
+#!/usr/bin/env python
+"""
+Capture from several devices concurrently
+
+Each device is armed and read on its own worker thread so devices that
+are waiting on a trigger (or on the transfer) overlap. Host side
+timestamps (time.time) of when each device was armed and when its
+capture completed are returned for rough alignment.
+"""
+
+import logging
+import multiprocessing
+from multiprocessing.pool import ThreadPool
+import time
+
+from . import nonblocking
+
+
+default_timeout = 60.
+
+logger = logging.getLogger(__name__)
+
+
+def _capture(device):
+    armed = None
+    try:
+        device.arm()
+        armed = time.time()
+        data = device.read_capture()
+        return {
+            'data': data, 'armed': armed, 'completed': time.time(),
+            'error': None}
+    except Exception as e:
+        logger.debug("capture failed for %s: %s", device, e)
+        return {
+            'data': None, 'armed': armed, 'completed': None, 'error': e}
+
+
+def _abort(device):
+    # unblock a pending read (pyserial >= 3 on posix)
+    cancel_read = getattr(device.port, 'cancel_read', None)
+    if cancel_read is not None:
+        try:
+            cancel_read()
+        except Exception as e:
+            logger.debug("cancel_read failed for %s: %s", device, e)
+
+
+def capture_all(devices, timeout=default_timeout):
+    """
+    Arm and capture from all devices concurrently
+
+    Returns one dict per device (in order) with keys
+        device: the device
+        data: the capture (None on failure)
+        armed: host time after the device was armed
+        completed: host time the capture finished reading
+        error: exception raised by the device (or Timeout), else None
+
+    A device that does not complete within timeout seconds (counted
+    from the start of the call) is reported with a Timeout error and
+    does not hold up the others. Its worker is abandoned and may still
+    be reading the device port (if the pending read can't be cancelled),
+    so reset (or reconnect) the device before using it again.
+    """
+    logger.debug("capture_all(%s, %s)", devices, timeout)
+    if timeout is None:
+        raise ValueError("timeout is required")
+    if not len(devices):
+        return []
+    pool = ThreadPool(len(devices))
+    try:
+        pending = [pool.apply_async(_capture, (d, )) for d in devices]
+        t = time.time() + timeout
+        results = []
+        for (d, p) in zip(devices, pending):
+            try:
+                r = p.get(max(t - time.time(), 0))
+            except multiprocessing.TimeoutError:
+                _abort(d)
+                r = {
+                    'data': None, 'armed': None, 'completed': None,
+                    'error': nonblocking.Timeout("capture timed out")}
+            r['device'] = d
+            results.append(r)
+    finally:
+        # don't join, hung workers are abandoned (they are daemons)
+        pool.close()
+    return results
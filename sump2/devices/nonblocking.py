@@ -0,0 +1,168 @@
+#!/usr/bin/env python
+"""
+Non-blocking sump device
+
+Requests (capture, metadata) are started with start_capture/start_metadata
+and completed by poll(), which only reads bytes that have already arrived.
+A single thread can drive many devices (and other instruments) by waiting
+on their fileno() with select (see wait_any), so waiting for a trigger
+never blocks the caller.
+"""
+
+import logging
+import select
+import time
+
+from . import ols
+from . import rs232
+from ..ops import raw
+
+
+logger = logging.getLogger(__name__)
+
+
+Timeout = raw.Timeout
+
+
+class NonBlockingSump(rs232.RS232Sump):
+    def __init__(self, port=None, baud=None, timeout=None, settings=None):
+        self._request = None
+        rs232.RS232Sump.__init__(self, port, baud, timeout, settings)
+
+    def fileno(self):
+        return self.port.fileno()
+
+    def reset(self, hard=True, flush=True):
+        """Reset, discarding received bytes without sleeping (see flush)"""
+        rs232.RS232Sump.reset(self, hard, flush=False)
+        if flush:
+            self.port.flushInput()
+
+    def _check_idle(self):
+        if self._request is not None:
+            raise IOError(
+                "%s request already pending" % (self._request['kind'], ))
+
+    def _start(self, kind, finish, n_bytes=None):
+        self._check_idle()
+        self._request = {
+            'kind': kind,
+            'n_bytes': n_bytes,
+            'finish': finish,
+            'buffer': [],
+            'n_read': 0,
+            'result': None,
+            'done': False,
+        }
+
+    def start_capture(self):
+        logger.debug("NonBlockingSump.start_capture")
+        self._check_idle()
+        self.arm()
+        offsets = self._group_offsets()
+        dt = rs232.capture_dtypes[len(offsets)]
+        self._start(
+            'capture',
+            lambda buf: rs232.unpack_samples(buf, offsets, dt),
+            self.settings.read_count * len(offsets))
+
+    def start_metadata(self):
+        logger.debug("NonBlockingSump.start_metadata")
+        self._start('metadata', ols.parse_metadata)
+        self.port.write('\x04')
+
+    def poll(self):
+        """Read any received bytes, True if the request is done"""
+        r = self._request
+        if r is None:
+            raise IOError("No pending request")
+        if r['done']:
+            return True
+        n = self.port.inWaiting()
+        if r['n_bytes'] is not None:
+            n = min(n, r['n_bytes'] - r['n_read'])
+        if n:
+            r['buffer'].append(self.port.read(n))
+            r['n_read'] += n
+        if r['n_bytes'] is not None:
+            if r['n_read'] < r['n_bytes']:
+                return False
+            r['result'] = r['finish'](''.join(r['buffer']))
+        else:
+            if not n:
+                return False
+            result = r['finish'](''.join(r['buffer']))
+            if result is None:
+                return False
+            r['result'] = result
+        r['done'] = True
+        return True
+
+    def done(self):
+        return self._request is not None and self._request['done']
+
+    def result(self):
+        """Return (and clear) the result of a completed request"""
+        if not self.done():
+            raise IOError("Request not done")
+        r = self._request
+        self._request = None
+        return r['result']
+
+    def cancel(self):
+        """Abandon the pending request (and stop an armed capture)"""
+        logger.debug("NonBlockingSump.cancel")
+        if self._request is None:
+            return
+        self._request = None
+        self.reset()
+
+    def wait(self, timeout=None, cancel=True):
+        """
+        Wait for the pending request and return the result
+
+        If the request is not done within timeout seconds it is cancelled
+        (unless cancel is False) and Timeout is raised.
+        """
+        if timeout is not None:
+            t = time.time() + timeout
+        while not self.poll():
+            dt = None if timeout is None else t - time.time()
+            if dt is not None and dt <= 0:
+                kind = self._request['kind']
+                if cancel:
+                    self.cancel()
+                raise Timeout("%s request timed out" % (kind, ))
+            select.select([self], [], [], dt)
+        return self.result()
+
+    def capture(self, timeout=None):
+        self.start_capture()
+        return self.wait(timeout)
+
+    def metadata(self, timeout=None):
+        self.start_metadata()
+        return self.wait(timeout)
+
+
+def wait_any(devices, timeout=None):
+    """
+    Wait until at least one device has a completed request
+
+    Devices without a pending request are skipped. Returns the list of
+    devices with completed requests, this is empty if timeout expired
+    (or no device has a pending request).
+    """
+    if timeout is not None:
+        t = time.time() + timeout
+    while True:
+        pending = [d for d in devices if d._request is not None]
+        if not pending:
+            return []
+        done = [d for d in pending if d.poll()]
+        if done:
+            return done
+        dt = None if timeout is None else t - time.time()
+        if dt is not None and dt <= 0:
+            return []
+        select.select(pending, [], [], dt)
@@ -3,7 +3,10 @@
 import logging
 import struct
 
+from . import cache
 from . import rs232
+from ..ops import rle
+from .. import settings as settings_module
 
 
 logger = logging.getLogger(__name__)
@@ -40,35 +43,81 @@ metadata_keys = {
 }
 
 
+def parse_metadata(buf):
+    """
+    Parse metadata from a string of received bytes
+
+    Returns None if buf does not yet contain the end of metadata marker.
+    """
+    md = {}
+    i = 0
+    while i < len(buf):
+        key = buf[i]
+        i += 1
+        if key == '\x00':
+            return md
+        if key not in metadata_keys:
+            raise ValueError("Unknown metadata key: %s" % (key, ))
+        n, uf = metadata_keys[key]
+        if uf is read_string:
+            j = buf.find('\x00', i)
+            if j == -1:
+                return None
+            md[n] = buf[i:j]
+            i = j + 1
+        elif uf is read_uint:
+            if i + 4 > len(buf):
+                return None
+            md[n] = struct.unpack('>I', buf[i:i + 4])[0]
+            i += 4
+        else:
+            if i + 1 > len(buf):
+                return None
+            md[n] = struct.unpack('B', buf[i])[0]
+            i += 1
+    return None
+
+
 class OLS(rs232.RS232Sump):
-    def __init__(self, port=None, baud=None, timeout=None, settings=None):
+    def __init__(
+            self, port=None, baud=None, timeout=None, settings=None,
+            metadata_cache=None):
+        """
+        metadata_cache can be None (always query the device, the
+        default), True (use cache.MetadataCache()) or a MetadataCache
+        """
+        self.metadata_cache = cache.resolve(metadata_cache)
+        self._metadata = None
         rs232.RS232Sump.__init__(self, port, baud, timeout, settings)
-        self._max_sample_rate = None
         if settings is None:
             self._autoconfigure()
 
-    def get_sample_rate(self):
-        if self._max_sample_rate is None:
-            md = self.metadata()
-            if 'Max Sample Rate' not in md:
+    def _max_sample_rate(self):
+        if self.settings.max_sample_rate is None:
+            self.metadata()
+            if self.settings.max_sample_rate is None:
                 raise Exception(
                     "unknown max sample rate, cannot set sample rate")
-            self._max_sample_rate = md['Max Sample Rate']
-        return self._max_sample_rate / float(self.settings.divider)
+        return self.settings.max_sample_rate
+
+    def get_sample_rate(self):
+        """Sample rate (Hz), see Settings.sample_rate"""
+        self._max_sample_rate()
+        return self.settings.sample_rate
 
     def set_sample_rate(self, rate):
-        if self._max_sample_rate is None:
-            md = self.metadata()
-            if 'Max Sample Rate' not in md:
-                raise Exception(
-                    "unknown max sample rate, cannot set sample rate")
-            self._max_sample_rate = md['Max Sample Rate']
-        self.settings.divider = int(self._max_sample_rate / float(rate))
+        max_rate = self._max_sample_rate()
+        if self.settings.demux:
+            max_rate *= 2
+        self.settings.divider = int(max_rate / float(rate))
 
     def _autoconfigure(self):
         md = self.metadata()
         nb = md.get('Sample Memory', 24576)
         self.settings.delay_count = 0
+        # deep memory devices accept 32 bit read and delay counts
+        self.settings.extended_counts = max(
+            nb, md.get('Dynamic Memory', 0)) > settings_module.max_short_count
         nprobes = md.get('N Probes (short)', md.get('N Probes', None))
         if nprobes is not None:
             if nprobes == 8:
@@ -81,8 +130,32 @@ class OLS(rs232.RS232Sump):
                 self.settings.channel_groups = 0b0
                 self.settings.read_count = nb // 4
 
-    def metadata(self):
-        logger.debug("OLS.metadata")
+    def metadata(self, refresh=False):
+        """
+        Device metadata, from memory or the metadata cache if available
+
+        If refresh is True the device is always queried. The reported
+        Max Sample Rate is kept in settings.max_sample_rate.
+        """
+        if not refresh and self._metadata is not None:
+            return self._metadata
+        md = None
+        key = None
+        if self.metadata_cache is not None:
+            key = (self.id_string(), self.port_string)
+            if not refresh:
+                md = self.metadata_cache.get(*key)
+        if md is None:
+            md = self.query_metadata()
+            if key is not None:
+                self.metadata_cache.set(key[0], key[1], md)
+        self._metadata = md
+        if 'Max Sample Rate' in md:
+            self.settings.max_sample_rate = md['Max Sample Rate']
+        return md
+
+    def query_metadata(self):
+        logger.debug("OLS.query_metadata")
         md = {}
         self.port.write('\x04')
         while True:
@@ -95,4 +168,22 @@ class OLS(rs232.RS232Sump):
             md[n] = uf(self.port)
         return md
 
-    # TODO rle
+    def capture_rle(self, dense=True):
+        """
+        Capture with run length encoding enabled
+
+        settings.rle is restored after the capture. Returns the expanded
+        capture (oldest sample first) if dense is True, otherwise
+        (timestamps, values) with one entry per run.
+        """
+        logger.debug("OLS.capture_rle(%s)", dense)
+        rle_enabled = self.settings.rle
+        self.settings.rle = True
+        try:
+            d = self.capture()[::-1]
+        finally:
+            self.settings.rle = rle_enabled
+        offsets = self._group_offsets()
+        if dense:
+            return rle.expand(d, offsets)
+        return rle.changes(d, offsets)
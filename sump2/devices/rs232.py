@@ -8,6 +8,7 @@ import time
 import numpy
 import serial
 
+from ..ops.raw import group_offsets, read_bytes, unpack_samples
 from ..settings import Settings
 
 defaults = {
@@ -29,7 +30,7 @@ class RS232Sump(object):
         if settings is None:
             settings = {}
         self.settings = Settings(settings)
-        self._settings_hash = None
+        self._sent_settings = None
         if port is None:
             port = settings.get('path', defaults['port'])
         self.port_string = port
@@ -40,6 +41,7 @@ class RS232Sump(object):
             timeout = settings.get('timeout', defaults['timeout'])
         self.timeout = timeout
         self.port = None
+        self.repeat_stats = None
         logger.debug(
             "RS232Sump.__init__(%s, %s, %s, %s)",
             port, baud, timeout, settings)
@@ -51,6 +53,7 @@ class RS232Sump(object):
             self.disconnect()
         self.port = serial.Serial(
             self.port_string, self.baud, timeout=self.timeout)
+        self._sent_settings = None
         self.flush()
         self.reset()
 
@@ -65,21 +68,30 @@ class RS232Sump(object):
         logger.debug("RS232Sump.__del__")
         self.disconnect()
 
-    def send_settings(self):
-        logger.debug("RS232Sump.send_settings")
-        self.reset()
-        h = self.settings.pack()
-        self.port.write(self.settings.pack())
-        self._settings_hash = h
-
-    def _check_settings_hash(self):
-        """False if settings need updated"""
-        if self._settings_hash is None:
-            return False
-        h = self.settings.pack()
-        if h != self._settings_hash:
-            return False
-        return True
+    def send_settings(self, force=False):
+        """
+        Send settings to the device
+
+        Only command groups that changed since the last upload are sent,
+        unless force is True (or nothing was sent yet) in which case the
+        device is reset and all settings are sent. Returns the packed
+        settings the device now holds.
+        """
+        logger.debug("RS232Sump.send_settings(%s)", force)
+        groups = self.settings.pack_groups()
+        if force or self._sent_settings is None:
+            self.reset()
+            self.port.write(''.join([msg for (_, msg) in groups]))
+        else:
+            changed = [
+                msg for (g, msg) in groups
+                if self._sent_settings.get(g, None) != msg]
+            if len(changed):
+                logger.debug(
+                    "RS232Sump.send_settings: %i changed", len(changed))
+                self.port.write(''.join(changed))
+        self._sent_settings = dict(groups)
+        return ''.join([msg for (_, msg) in groups])
 
     def flush(self, timeout=0.1):
         while self.port.inWaiting():
@@ -106,30 +118,142 @@ class RS232Sump(object):
     def xoff(self):
         self.port.write('\x13')
 
-    def _build_unpack_functions(self):
-        ufs = []
-        for i in xrange(self.settings.max_channel_groups):
-            if not self.settings.channel_groups & (0b1 << i):
-                o = 8 * i
-                ufs.append(lambda c, o=o: ord(c) << o)
-        return ufs
+    def _group_offsets(self):
+        return group_offsets(
+            self.settings.channel_groups, self.settings.max_channel_groups)
+
+    def arm(self):
+        """Send (changed) settings and start a capture, see send_settings"""
+        packed = self.send_settings()
+        self.port.write('\x01')
+        return packed
+
+    def capture(self, chunk_samples=65536, out=None):
+        """
+        Capture, reading and unpacking chunk_samples at a time
 
-    def capture(self):
+        If provided, the capture is unpacked into out (which must hold
+        settings.read_count samples) instead of a new array.
+        """
         logger.debug("RS232Sump.capture")
-        if not self._check_settings_hash():
-            self.send_settings()
-        ufs = self._build_unpack_functions()
+        self.arm()
+        return self.read_capture(chunk_samples, out)
+
+    def read_capture(self, chunk_samples=65536, out=None):
+        """Read (and unpack) the capture started by arm"""
+        offsets = self._group_offsets()
         logger.debug(
-            "RS232Sump.capture: built %i unpack functions" %
-            len(ufs))
+            "RS232Sump.read_capture: %i enabled channel groups" %
+            len(offsets))
         # include trigger value
         n_samples = self.settings.read_count
-        dt = capture_dtypes[len(ufs)]
-        d = numpy.empty(n_samples, dtype=dt)
-        self.port.write('\x01')
-        for i in xrange(n_samples):
-            v = 0
-            for uf in ufs:
-                v |= uf(self.port.read(1))
-            d[i] = v
+        dt = capture_dtypes[len(offsets)]
+        if out is None:
+            out = numpy.empty(n_samples, dtype=dt)
+        for i in xrange(0, n_samples, chunk_samples):
+            n = min(chunk_samples, n_samples - i)
+            unpack_samples(
+                read_bytes(self.port, n * len(offsets)), offsets, dt,
+                out[i:i + n])
+        return out
+
+    def capture_iter(self, chunk_samples=1024, oldest_first=False):
+        """
+        Capture, yielding (offset, chunk) as samples arrive
+
+        Samples arrive newest first and by default chunks are yielded in
+        that order with offset counting up from 0. If oldest_first is
+        True each chunk is reversed (as a view) and offset counts down so
+        that out[offset:offset + len(chunk)] = chunk builds an oldest
+        first capture.
+        """
+        logger.debug("RS232Sump.capture_iter(%s)", chunk_samples)
+        self.arm()
+        offsets = self._group_offsets()
+        n_samples = self.settings.read_count
+        dt = capture_dtypes[len(offsets)]
+        n_read = 0
+        try:
+            for i in xrange(0, n_samples, chunk_samples):
+                n = min(chunk_samples, n_samples - i)
+                d = unpack_samples(
+                    read_bytes(self.port, n * len(offsets)), offsets, dt)
+                n_read += n
+                if oldest_first:
+                    yield n_samples - i - n, d[::-1]
+                else:
+                    yield i, d
+        finally:
+            if n_read < n_samples:
+                # stopped early, abort (and discard) the rest of the transfer
+                self.reset()
+
+    def capture_repeat(self, n=None, chunk_samples=65536, out=None):
+        """
+        Capture n times (or forever if n is None)
+
+        Settings stay resident on the device (only changes are uploaded),
+        no resets or flushes are done between captures and the next
+        capture is armed as soon as the last byte of the previous one is
+        read (before it is unpacked and yielded). Achieved throughput is
+        kept in repeat_stats (captures, elapsed, rate in captures/second).
+
+        Yields (data, packed settings the capture was armed with). If out
+        (an iterable of read_count sample arrays, e.g. the rows of a ring
+        buffer) is provided, each capture is unpacked into the next array
+        of out instead of a new array.
+        """
+        logger.debug("RS232Sump.capture_repeat(%s)", n)
+        if out is not None:
+            out = iter(out)
+        # packing rounds read_count, check out before arming
+        self.settings.pack()
+        d = self._capture_out(out, *self._capture_layout()[1:])
+        packed = self.arm()
+        layout = self._capture_layout()
+        t0 = time.time()
+        i = 0
+        self.repeat_stats = {'captures': 0, 'elapsed': 0., 'rate': 0.}
+        try:
+            while n is None or i < n:
+                offsets, n_samples, dt = layout
+                buf = read_bytes(self.port, n_samples * len(offsets))
+                layout = None
+                i += 1
+                armed = packed
+                if n is None or i < n:
+                    packed = self.arm()
+                    layout = self._capture_layout()
+                elapsed = time.time() - t0
+                self.repeat_stats = {
+                    'captures': i, 'elapsed': elapsed,
+                    'rate': i / elapsed if elapsed else float('inf')}
+                for j in xrange(0, n_samples, chunk_samples):
+                    k = j * len(offsets)
+                    unpack_samples(
+                        buf[k:k + chunk_samples * len(offsets)], offsets, dt,
+                        d[j:j + chunk_samples])
+                yield d, armed
+                if layout is not None:
+                    d = self._capture_out(out, *layout[1:])
+        finally:
+            if layout is not None:
+                # stopped with a capture armed, discard it
+                self.reset()
+            logger.debug(
+                "RS232Sump.capture_repeat: %s", self.repeat_stats)
+
+    def _capture_layout(self):
+        offsets = self._group_offsets()
+        return (
+            offsets, self.settings.read_count, capture_dtypes[len(offsets)])
+
+    def _capture_out(self, out, n_samples, dt):
+        # array to unpack the next capture of capture_repeat into
+        if out is None:
+            return numpy.empty(n_samples, dtype=dt)
+        d = next(out)
+        if len(d) != n_samples:
+            raise ValueError(
+                "out array [%s] != read_count [%s]" % (len(d), n_samples))
         return d
@@ -0,0 +1,148 @@
+#!/usr/bin/env python
+"""
+Segmented (ring buffer) acquisition of repeated captures
+
+Successive captures are unpacked (see RS232Sump.capture_repeat) into
+the rows of a preallocated (n_segments x read_count) buffer by a
+background thread. Each segment records the host time (time.time) the
+capture was read, the sha1 of the packed settings it was taken with and
+its sequence number (count of captures since start, -1 if the segment
+is empty or being written).
+
+latest returns views into the buffer (no copies): a view stays valid
+until its segment is overwritten, n_segments - 1 captures later, which
+can be checked with valid(sequence).
+"""
+
+import hashlib
+import itertools
+import logging
+import threading
+import time
+
+import numpy
+
+from . import rs232
+from ..ops import raw
+
+
+logger = logging.getLogger(__name__)
+
+
+class SegmentedAcquisition(object):
+    def __init__(self, device, n_segments, chunk_samples=65536,
+                 max_timeouts=None):
+        if n_segments < 2:
+            raise ValueError("n_segments must be >= 2 [%s]" % n_segments)
+        self.device = device
+        self.n_segments = n_segments
+        self.chunk_samples = chunk_samples
+        # consecutive read timeouts (no trigger) before giving up
+        self.max_timeouts = max_timeouts
+        offsets = device._group_offsets()
+        # packing rounds read_count to what the device captures
+        device.settings.pack()
+        self.buffer = numpy.empty(
+            (n_segments, device.settings.read_count),
+            dtype=rs232.capture_dtypes[len(offsets)])
+        self.timestamps = numpy.zeros(n_segments, dtype='f8')
+        self.sequences = numpy.empty(n_segments, dtype='i8')
+        self.sequences[:] = -1
+        self.settings_hashes = [None] * n_segments
+        self.count = 0
+        self.timeouts = 0
+        self.error = None
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+
+    @property
+    def running(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self):
+        logger.debug("SegmentedAcquisition.start")
+        if self.running:
+            return
+        self.error = None
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run)
+        self._thread.daemon = True
+        self._thread.start()
+
+    def stop(self, timeout=None):
+        """Stop after the capture in progress, wait for the thread"""
+        logger.debug("SegmentedAcquisition.stop")
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    def _run(self):
+        n_timeouts = 0
+        while not self._stop.is_set():
+            # capture count is written to row count % n_segments
+            rows = (
+                self.buffer[i % self.n_segments]
+                for i in itertools.count(self.count))
+            gen = self.device.capture_repeat(
+                chunk_samples=self.chunk_samples, out=rows)
+            try:
+                self._invalidate(self.count)
+                for (_, packed) in gen:
+                    n_timeouts = 0
+                    self._commit(self.count, packed)
+                    self._invalidate(self.count)
+                    if self._stop.is_set():
+                        break
+            except raw.Timeout as e:
+                # nothing triggered within the port timeout, re-arm
+                logger.debug("SegmentedAcquisition timeout: %s", e)
+                n_timeouts += 1
+                self.timeouts += 1
+                if (
+                        self.max_timeouts is not None and
+                        n_timeouts >= self.max_timeouts):
+                    self.error = e
+                    break
+            except Exception as e:
+                # including other IOErrors (e.g. the device was unplugged)
+                logger.debug("SegmentedAcquisition failed: %s", e)
+                self.error = e
+                break
+            finally:
+                gen.close()
+
+    def _invalidate(self, sequence):
+        # mark the segment about to be written
+        with self._lock:
+            self.sequences[sequence % self.n_segments] = -1
+
+    def _commit(self, sequence, packed):
+        i = sequence % self.n_segments
+        h = hashlib.sha1(packed).hexdigest()
+        with self._lock:
+            self.timestamps[i] = time.time()
+            self.settings_hashes[i] = h
+            self.sequences[i] = sequence
+            self.count = sequence + 1
+
+    def valid(self, sequence):
+        """True if the segment of sequence still holds that capture"""
+        with self._lock:
+            return self.sequences[sequence % self.n_segments] == sequence
+
+    def latest(self, n=1):
+        """
+        The n most recent captures (newest first) as a list of
+            (sequence, timestamp, settings hash, view of buffer row)
+        """
+        with self._lock:
+            r = []
+            for s in xrange(self.count - 1, max(self.count - n, 0) - 1, -1):
+                i = s % self.n_segments
+                if self.sequences[i] != s:
+                    break
+                r.append((
+                    s, self.timestamps[i], self.settings_hashes[i],
+                    self.buffer[i]))
+            return r
@@ -0,0 +1,96 @@
+#!/usr/bin/env python
+"""
+Parallel bus cycle extraction
+
+Each assertion of a strobe is one bus cycle. The address is sampled
+when the strobe is asserted and the data on the last sample before it
+is released. Returns a record array (sorted by start) with one record
+per cycle:
+    start: first sample with the strobe asserted
+    end: first sample after the strobe was released
+    address
+    data
+    write: True for write cycles
+    strobe: index of the strobe (in sorted strobe name order)
+
+Cycles that are cut off by the start or end of the capture are dropped.
+
+The default spec and strobes are for an 8080 style bus (see
+sump2.ops.parse), with reads on DBIN (active high) and writes on
+/WR (active low).
+"""
+
+import numpy
+
+from . import edges
+from . import parse
+
+
+i8080 = {
+    'address': (0, 16),
+    'data': (16, 8),
+    'litfin': 24,
+    'litfout': 25,
+    'sysr': 26,
+    'systb': 27,
+    'dbin': 28,
+    'wr': 29,
+    'memr': 30,
+    'o2': 31,
+}
+
+# strobe name: (direction, active high)
+i8080_strobes = {
+    'dbin': ('read', True),
+    'wr': ('write', False),
+}
+
+
+def cycles(
+        capture, spec=None, strobes=None, address='address', data='data'):
+    """Extract bus cycles from a capture (oldest sample first)"""
+    if spec is None:
+        spec = i8080
+    if strobes is None:
+        strobes = i8080_strobes
+    raw = parse.as_unsigned(getattr(capture, 'raw', capture))
+    n = len(raw)
+    address = parse.Field(spec[address])
+    data = parse.Field(spec[data])
+    starts = []
+    ends = []
+    write = []
+    strobe = []
+    for (i, name) in enumerate(sorted(strobes)):
+        direction, active_high = strobes[name]
+        if direction not in ('read', 'write'):
+            raise ValueError("Invalid strobe direction: %s" % (direction, ))
+        active = parse.unpack(raw, spec[name]).astype(bool)
+        if not active_high:
+            active = ~active
+        s, e = edges.runs(active)
+        complete = (s > 0) & (e < n)
+        starts.append(s[complete])
+        ends.append(e[complete])
+        write.append(numpy.full(
+            complete.sum(), direction == 'write', dtype=bool))
+        strobe.append(numpy.full(complete.sum(), i, dtype='uint8'))
+    starts = numpy.concatenate(starts)
+    ends = numpy.concatenate(ends)
+    order = numpy.argsort(starts, kind='mergesort')
+    starts = starts[order]
+    ends = ends[order]
+    r = numpy.empty(len(starts), dtype=[
+        ('start', 'int64'),
+        ('end', 'int64'),
+        ('address', address.dtype),
+        ('data', data.dtype),
+        ('write', bool),
+        ('strobe', 'uint8')])
+    r['start'] = starts
+    r['end'] = ends
+    r['address'] = parse.unpack(raw[starts], address)
+    r['data'] = parse.unpack(raw[ends - 1], data)
+    r['write'] = numpy.concatenate(write)[order]
+    r['strobe'] = numpy.concatenate(strobe)[order]
+    return r
@@ -0,0 +1,82 @@
+#!/usr/bin/env python
+"""
+Per channel transition (edge) index
+
+Edges are stored as the index of the first sample with the new level,
+so a rising edge at i means channel is 0 at i - 1 and 1 at i.
+kind can be None (all edges), 'rising' or 'falling'.
+
+Data must be oldest sample first (as for the decoders). RS232Sump.capture
+returns the newest sample first, reverse it (capture[::-1]) or rising and
+falling edges are swapped.
+"""
+
+import numpy
+
+from . import parse
+
+
+def runs(active):
+    """(starts, ends) of runs where bool array active is True"""
+    d = numpy.diff(active.astype('int8'))
+    starts = numpy.flatnonzero(d == 1) + 1
+    ends = numpy.flatnonzero(d == -1) + 1
+    if len(active) and active[0]:
+        starts = numpy.append(0, starts)
+    if len(active) and active[-1]:
+        ends = numpy.append(ends, len(active))
+    return starts, ends
+
+
+class TransitionIndex(object):
+    def __init__(self, data, n_channels=None):
+        data = parse.as_unsigned(data)
+        if n_channels is None:
+            n_channels = data.dtype.itemsize * 8
+        self.n_samples = len(data)
+        self.n_channels = n_channels
+        changed = data[1:] ^ data[:-1]
+        nz = numpy.flatnonzero(changed)
+        changed = changed[nz]
+        after = data[nz + 1]
+        nz += 1
+        self._edges = {None: [], 'rising': [], 'falling': []}
+        for ch in xrange(n_channels):
+            m = ((changed >> ch) & 0b1).astype(bool)
+            e = nz[m]
+            rising = ((after[m] >> ch) & 0b1).astype(bool)
+            self._edges[None].append(e)
+            self._edges['rising'].append(e[rising])
+            self._edges['falling'].append(e[~rising])
+
+    def edges(self, ch, kind=None):
+        """Sorted edge positions of channel ch"""
+        if kind not in self._edges:
+            raise ValueError("Invalid edge kind: %s" % (kind, ))
+        return self._edges[kind][ch]
+
+    def next_edge(self, ch, i, kind=None):
+        """First edge after sample i (or None)"""
+        e = self.edges(ch, kind)
+        j = numpy.searchsorted(e, i, side='right')
+        if j == len(e):
+            return None
+        return int(e[j])
+
+    def prev_edge(self, ch, i, kind=None):
+        """Last edge at or before sample i (or None)"""
+        e = self.edges(ch, kind)
+        j = numpy.searchsorted(e, i, side='right')
+        if j == 0:
+            return None
+        return int(e[j - 1])
+
+    def edges_in(self, ch, start, stop, kind=None):
+        """Edges in [start, stop)"""
+        e = self.edges(ch, kind)
+        return e[
+            numpy.searchsorted(e, start, side='left'):
+            numpy.searchsorted(e, stop, side='left')]
+
+    def count(self, ch, kind=None):
+        return len(self.edges(ch, kind))
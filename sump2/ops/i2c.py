@@ -0,0 +1,82 @@
+#!/usr/bin/env python
+"""
+I2C decoding
+
+START (SDA falling while SCL is high) and STOP (SDA rising while SCL is
+high) conditions split the capture into transactions (a repeated START
+begins a new transaction). SDA is sampled on SCL rising edges and the
+bits of each transaction are grouped in 9s (8 data bits, msb first, and
+ACK). Returns a flat record array with one record per byte:
+    sample: SCL rising edge of the first bit
+    transaction: index of the transaction (START)
+    index: byte index within the transaction (0 is the address byte)
+    address: 7 bit address of the transaction
+    read: R/W bit of the transaction (True for reads)
+    data: byte value (for index 0 this is the address byte)
+    ack: True if the byte was ACKed (SDA low on the 9th bit)
+"""
+
+import numpy
+
+from . import parse
+
+
+def decode(capture, scl, sda):
+    """Decode I2C bytes from a capture (oldest sample first)"""
+    data = parse.as_unsigned(getattr(capture, 'raw', capture))
+    c = ((data >> scl) & 0b1).astype(bool)
+    d = ((data >> sda) & 0b1).astype(bool)
+    high = c[:-1] & c[1:]
+    starts = numpy.flatnonzero(d[:-1] & ~d[1:] & high) + 1
+    stops = numpy.flatnonzero(~d[:-1] & d[1:] & high) + 1
+    bounds = numpy.concatenate((starts, stops))
+    is_start = numpy.concatenate((
+        numpy.ones(len(starts), dtype=bool),
+        numpy.zeros(len(stops), dtype=bool)))
+    order = numpy.argsort(bounds, kind='mergesort')
+    bounds = bounds[order]
+    is_start = is_start[order]
+    transaction = numpy.cumsum(is_start) - 1
+
+    # assign each SCL rising edge to the preceding START (or STOP)
+    edges = numpy.flatnonzero(~c[:-1] & c[1:]) + 1
+    b = numpy.searchsorted(bounds, edges, 'right') - 1
+    valid = b >= 0
+    valid[valid] = is_start[b[valid]]
+    edges = edges[valid]
+    b = b[valid]
+
+    # bit position within transaction, keep only complete bytes
+    rank = numpy.arange(len(b)) - numpy.searchsorted(b, b, 'left')
+    n_bytes = numpy.bincount(b, minlength=len(bounds)) // 9
+    keep = (rank // 9) < n_bytes[b]
+    edges = edges[keep]
+    b = b[keep]
+    rank = rank[keep]
+    bit = rank % 9
+    first = numpy.flatnonzero(bit == 0)
+
+    bits = d[edges].astype('uint16')
+    bits[bit == 8] = 0
+    shifts = (8 - bit).astype('uint16')
+    r = numpy.empty(len(first), dtype=[
+        ('sample', 'int64'),
+        ('transaction', 'int64'),
+        ('index', 'int64'),
+        ('address', 'uint8'),
+        ('read', bool),
+        ('data', 'uint8'),
+        ('ack', bool)])
+    if not len(first):
+        return r
+    values = numpy.bitwise_or.reduceat(bits << shifts, first) >> 1
+    r['sample'] = edges[first]
+    r['transaction'] = transaction[b[first]]
+    r['index'] = rank[first] // 9
+    r['data'] = values
+    r['ack'] = ~d[edges[first + 8]]
+    # address byte (index 0) of each byte's transaction
+    address_byte = values[numpy.searchsorted(b[first], b[first], 'left')]
+    r['address'] = address_byte >> 1
+    r['read'] = (address_byte & 0b1).astype(bool)
+    return r
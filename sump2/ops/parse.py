@@ -15,30 +15,201 @@ settings = {
 
 if settings[key] is a tuple = (start bit, length)
 if settings[key] is a single value = bit index
+if settings[key] is a dict, it can contain
+    bits: list of bit indices (or start and length)
+    order: 'lsb' (default, bits[0] is the field lsb) or 'msb'
+    signed: if True, the field is sign extended (default False)
+for example {'bits': [7, 3, 12, 13], 'order': 'msb', 'signed': True}
+
+Each field is returned in the smallest unsigned dtype that holds it.
+A spec can be compiled once (Spec(settings)) and reused to parse many
+captures (see parse_many).
+
+If capture is a sump2.capture.changes.ChangeList, only the values at
+each change are parsed and ChangeLists are returned.
 """
 
 import numpy
 
+from ..capture import changes
+
+
+field_dtypes = [numpy.uint8, numpy.uint16, numpy.uint32, numpy.uint64]
+
+
+def field_dtype(length, signed=False):
+    """Smallest (unsigned) dtype that holds length bits"""
+    for dt in field_dtypes:
+        dt = numpy.dtype(dt)
+        if length <= dt.itemsize * 8:
+            if signed:
+                return numpy.dtype(dt.str.replace('u', 'i'))
+            return dt
+    raise ValueError("field length %s is > 64 bits" % (length, ))
+
+
+def as_unsigned(data):
+    """View (or convert) data as an unsigned integer array"""
+    data = numpy.asarray(data)
+    if data.dtype.kind == 'u':
+        return data
+    if data.dtype.kind == 'i':
+        return data.view(data.dtype.str.replace('i', 'u'))
+    return data.astype(numpy.uint64)
+
+
+def _unpack(data, start, length, tmp=None):
+    # shift and mask in the native dtype of data (into tmp if provided)
+    n_bits = data.dtype.itemsize * 8
+    if tmp is None:
+        tmp = numpy.empty_like(data)
+    if start >= n_bits:
+        tmp[:] = 0
+        return tmp
+    numpy.right_shift(data, start, out=tmp)
+    if length < n_bits - start:
+        numpy.bitwise_and(tmp, (1 << length) - 1, out=tmp)
+    return tmp
+
+
+def _runs(bits):
+    """Group field bits (lsb first) into (source bit, field bit, length)"""
+    runs = []
+    for (i, b) in enumerate(bits):
+        if len(runs) and runs[-1][0] + runs[-1][2] == b:
+            runs[-1][2] += 1
+        else:
+            runs.append([b, i, 1])
+    return [tuple(r) for r in runs]
+
+
+class Field(object):
+    """
+    A compiled field spec
+
+    Fields made of a few contiguous runs of bits are unpacked with one
+    shift and mask per run, fields with many runs (scattered or reversed
+    bits) with one 256 entry lookup table per source byte.
+    """
+    def __init__(self, spec):
+        self.signed = False
+        if isinstance(spec, (tuple, list)):
+            if len(spec) != 2:
+                raise ValueError(
+                    "spec must be of len 2 [!=%s]" % (len(spec), ))
+            bits = range(int(spec[0]), int(spec[0]) + int(spec[1]))
+        elif isinstance(spec, dict):
+            if 'bits' in spec:
+                bits = [int(b) for b in spec['bits']]
+            else:
+                start = int(spec['start'])
+                bits = range(start, start + int(spec['length']))
+            order = spec.get('order', 'lsb')
+            if order == 'msb':
+                bits = bits[::-1]
+            elif order != 'lsb':
+                raise ValueError("Invalid bit order: %s" % (order, ))
+            self.signed = bool(spec.get('signed', False))
+        else:
+            bits = [int(spec)]
+        if not len(bits):
+            raise ValueError("field must contain at least 1 bit")
+        self.bits = bits
+        self.length = len(bits)
+        self.dtype = field_dtype(self.length, self.signed)
+        self.runs = _runs(bits)
+        source_bytes = sorted(set(b // 8 for b in bits))
+        self.tables = None
+        if len(self.runs) > len(source_bytes):
+            udt = field_dtype(self.length)
+            values = numpy.arange(256, dtype=udt)
+            self.tables = []
+            for sb in source_bytes:
+                t = numpy.zeros(256, dtype=udt)
+                for (i, b) in enumerate(bits):
+                    if b // 8 == sb:
+                        t |= ((values >> (b - 8 * sb)) & 0b1) << i
+                self.tables.append((sb, t))
+
+    def unpack(self, data, tmp=None):
+        """
+        Unpack the field from unsigned data
+
+        The result may be tmp (in the dtype of data), cast to self.dtype.
+        """
+        if (
+                not self.signed and len(self.runs) == 1 and
+                self.runs[0][1] == 0):
+            return _unpack(data, self.runs[0][0], self.length, tmp)
+        udt = field_dtype(self.length)
+        r = numpy.zeros(len(data), dtype=udt)
+        if self.tables is None:
+            for (sb, fb, n) in self.runs:
+                r |= _unpack(data, sb, n, tmp).astype(udt) << fb
+        else:
+            for (sb, t) in self.tables:
+                if sb < data.dtype.itemsize:
+                    r |= t[_unpack(data, 8 * sb, 8, tmp)]
+        if self.signed:
+            shift = udt.itemsize * 8 - self.length
+            r = (r << shift).view(self.dtype) >> shift
+        return r
+
+
+class Spec(object):
+    """A compiled parse spec, (name, Field) for each field"""
+    def __init__(self, settings):
+        self.fields = [(k, Field(settings[k])) for k in sorted(settings)]
+        self.dtype = numpy.dtype([(k, f.dtype) for (k, f) in self.fields])
+
+    def parse(self, capture, columnar=False):
+        if isinstance(capture, changes.ChangeList):
+            r = self.parse(capture.values, columnar)
+            if columnar:
+                return dict([
+                    (k, changes.ChangeList(
+                        capture.indices, r[k], capture.n_samples))
+                    for k in r])
+            return changes.ChangeList(capture.indices, r, capture.n_samples)
+        c = as_unsigned(capture)
+        tmp = numpy.empty_like(c)
+        if columnar:
+            r = {}
+        else:
+            r = numpy.empty(len(c), dtype=self.dtype)
+        for (k, f) in self.fields:
+            v = f.unpack(c, tmp)
+            if columnar:
+                r[k] = v.astype(f.dtype)
+            else:
+                r[k] = v
+        return r
+
 
 def unpack(data, spec):
-    if isinstance(spec, (tuple, list)):
-        if len(spec) != 2:
-            raise ValueError("spec must be of len 2 [!=%s]" % (len(spec), ))
-        start, length = spec
-        return (data >> start) & (2 ** length - 1)
-    elif isinstance(spec, dict):
-        raise NotImplementedError("Complex unpacking not yet supported")
-    else:
-        return (data >> int(spec)) & 0b1
-
-
-def parse(capture, settings=None, **kwargs):
-    if settings is None:
-        settings = {}
-    settings.update(kwargs)
-    c = numpy.array(capture, dtype='int64')  # to allow unsafe shifting
-    dt = [(k, 'int64') for k in sorted(settings)]
-    r = numpy.empty(len(c), dtype=dt)
-    for k in settings:
-        r[k] = unpack(c, settings[k])
-    return r
+    if not isinstance(spec, Field):
+        spec = Field(spec)
+    return spec.unpack(as_unsigned(data)).astype(spec.dtype, copy=False)
+
+
+def parse(capture, settings=None, columnar=False, **kwargs):
+    """
+    Parse capture into fields
+
+    settings (and kwargs) are a spec (see above) or a compiled Spec.
+    Returns a record array, or a dict of arrays if columnar is True.
+    """
+    if not isinstance(settings, Spec):
+        spec = {}
+        if settings is not None:
+            spec.update(settings)
+        spec.update(kwargs)
+        settings = Spec(spec)
+    return settings.parse(capture, columnar)
+
+
+def parse_many(captures, settings, columnar=False):
+    """Parse several captures with one compiled spec"""
+    if not isinstance(settings, Spec):
+        settings = Spec(settings)
+    return [settings.parse(c, columnar) for c in captures]
@@ -0,0 +1,62 @@
+#!/usr/bin/env python
+"""
+Raw sample transfers
+
+Reading exact byte counts from a port and unpacking the bytes of the
+enabled channel groups into one integer per sample (shared by
+sump2.devices and sump.Interface).
+"""
+
+import numpy
+
+
+class Timeout(IOError):
+    """Nothing (or not enough) was received within the port timeout"""
+    pass
+
+
+def group_offsets(channel_groups, max_channel_groups=4):
+    """Bit offsets of the enabled (not disabled) channel groups"""
+    return [
+        8 * i for i in xrange(max_channel_groups)
+        if not channel_groups & (0b1 << i)]
+
+
+def read_bytes(port, n_bytes, block_size=None):
+    """
+    Read exactly n_bytes from port, block_size bytes at a time
+
+    Raises Timeout if a read returns nothing (the port timed out).
+    """
+    if block_size is None:
+        block_size = n_bytes
+    blocks = []
+    n_read = 0
+    while n_read < n_bytes:
+        b = port.read(min(block_size, n_bytes - n_read))
+        if not b:
+            raise Timeout(
+                "Timed out after reading %i of %i bytes" % (n_read, n_bytes))
+        blocks.append(b)
+        n_read += len(b)
+    return ''.join(blocks)
+
+
+def unpack_samples(buf, offsets, dtype=numpy.uint32, out=None):
+    """
+    Unpack a raw capture (len(offsets) bytes per sample) into dtype
+
+    Each sample byte is shifted to the offset of its channel group,
+    bits that do not fit in dtype are dropped. If provided, samples
+    are unpacked into out.
+    """
+    raw = numpy.frombuffer(buf, dtype=numpy.uint8)
+    raw = raw.reshape(-1, max(len(offsets), 1))
+    if out is None:
+        out = numpy.empty(len(raw) if len(offsets) else 0, dtype=dtype)
+    out[:] = 0
+    n_bits = out.itemsize * 8
+    for (i, o) in enumerate(offsets):
+        if o < n_bits:
+            out |= raw[:, i].astype(out.dtype) << o
+    return out
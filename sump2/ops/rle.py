@@ -0,0 +1,62 @@
+#!/usr/bin/env python
+"""
+Run length encoded (RLE) captures
+
+With RLE enabled the device follows a sample value that was held
+with a count word. Count words have the most significant bit of the
+transferred sample (bit 7 of the last enabled channel group) set, the
+remaining bits are the number of additional samples the preceding
+value was held.
+
+All functions expect samples oldest first (reverse a capture from
+RS232Sump.capture) and the bit offsets of the enabled channel groups
+(see sump2.ops.raw.group_offsets).
+"""
+
+import numpy
+
+
+default_offsets = [0, 8, 16, 24]
+
+
+def flag_bit(offsets=None):
+    if offsets is None:
+        offsets = default_offsets
+    return offsets[-1] + 7
+
+
+def split(samples, offsets=None):
+    """Split samples into (values, durations) of each run"""
+    if offsets is None:
+        offsets = default_offsets
+    samples = numpy.asarray(samples)
+    flag = flag_bit(offsets)
+    is_count = ((samples >> flag) & 0b1).astype(bool)
+    is_value = ~is_count
+    values = samples[is_value]
+    # index of the value each count word belongs to
+    owner = numpy.cumsum(is_value) - 1
+    is_count &= owner >= 0
+    cs = samples[is_count].astype('int64')
+    counts = numpy.zeros(len(cs), dtype='int64')
+    for (i, o) in enumerate(offsets):
+        counts |= ((cs >> o) & 0xFF) << (8 * i)
+    counts &= (1 << (8 * len(offsets) - 1)) - 1
+    durations = numpy.bincount(
+        owner[is_count], weights=counts,
+        minlength=len(values)).astype('int64')
+    durations += 1
+    return values, durations
+
+
+def expand(samples, offsets=None):
+    """Expand RLE samples to one value per sample"""
+    values, durations = split(samples, offsets)
+    return numpy.repeat(values, durations)
+
+
+def changes(samples, offsets=None):
+    """Convert RLE samples to (timestamps, values), one per run"""
+    values, durations = split(samples, offsets)
+    timestamps = numpy.cumsum(durations) - durations
+    return timestamps, values
@@ -0,0 +1,89 @@
+#!/usr/bin/env python
+"""
+SPI decoding
+
+Data lines are sampled at the active clock edges within each chip
+select (cs) window and assembled into words with bitwise_or.reduceat.
+Returns a record array with one record per complete word:
+    start_sample: clock edge of the first bit
+    end_sample: clock edge of the last bit
+    transfer: index of the cs window the word is in
+    mosi/miso: word (for each data line given)
+
+mode is the usual CPOL/CPHA mode number (0-3), data is sampled on
+rising clock edges in modes 0 and 3 and on falling edges in 1 and 2.
+"""
+
+import numpy
+
+from . import edges as edges_module
+from . import parse
+
+
+def decode(
+        capture, sclk, mosi=None, miso=None, cs=None, mode=0,
+        word_size=8, lsb_first=False, cs_active_low=True):
+    """
+    Decode SPI words from a capture (oldest sample first)
+
+    capture can be an array or a sump2.capture.Capture. If cs is None
+    the whole capture is treated as one transfer.
+    """
+    if mode not in (0, 1, 2, 3):
+        raise ValueError("Invalid SPI mode: %s" % (mode, ))
+    data = parse.as_unsigned(getattr(capture, 'raw', capture))
+    n = len(data)
+
+    def line(ch):
+        return ((data >> ch) & 0b1).astype(bool)
+
+    clk = line(sclk)
+    cpol, cpha = mode >> 1, mode & 0b1
+    if cpol == cpha:
+        edges = numpy.flatnonzero(~clk[:-1] & clk[1:]) + 1
+    else:
+        edges = numpy.flatnonzero(clk[:-1] & ~clk[1:]) + 1
+
+    if cs is None:
+        starts, ends = numpy.array([0]), numpy.array([n])
+    else:
+        active = line(cs)
+        if cs_active_low:
+            active = ~active
+        starts, ends = edges_module.runs(active)
+    # assign each edge to the cs window it falls in
+    w = numpy.searchsorted(starts, edges, 'right') - 1
+    valid = w >= 0
+    valid[valid] = edges[valid] < ends[w[valid]]
+    edges = edges[valid]
+    w = w[valid]
+
+    # bit position within window, keep only complete words
+    rank = numpy.arange(len(w)) - numpy.searchsorted(w, w, 'left')
+    n_words = numpy.bincount(w, minlength=len(starts)) // word_size
+    keep = (rank // word_size) < n_words[w]
+    edges = edges[keep]
+    w = w[keep]
+    bit = rank[keep] % word_size
+    first = numpy.flatnonzero(bit == 0)
+    if lsb_first:
+        shifts = bit
+    else:
+        shifts = word_size - 1 - bit
+    shifts = shifts.astype('uint64')
+
+    lines = [(k, ch) for (k, ch) in (('mosi', mosi), ('miso', miso))
+             if ch is not None]
+    word_dtype = parse.field_dtype(word_size)
+    r = numpy.empty(len(first), dtype=[
+        ('start_sample', 'int64'),
+        ('end_sample', 'int64'),
+        ('transfer', 'int64')] + [(k, word_dtype) for (k, _) in lines])
+    r['start_sample'] = edges[first]
+    r['end_sample'] = edges[first + word_size - 1]
+    r['transfer'] = w[first]
+    for (k, ch) in lines:
+        bits = line(ch)[edges].astype('uint64') << shifts
+        if len(first):
+            r[k] = numpy.bitwise_or.reduceat(bits, first)
+    return r
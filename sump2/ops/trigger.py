@@ -0,0 +1,120 @@
+#!/usr/bin/env python
+"""
+Software evaluation of sump trigger stages on recorded captures
+
+Stages are dicts as in sump2.settings.Triggers (mask, value, delay,
+level, channel, serial, start). A stage is active while the trigger
+level is >= its level. When an active stage matches (after delay
+samples) it either fires the trigger (start) and resets the level to 0,
+or advances the level by 1.
+
+Parallel stages match when (sample & mask) == (value & mask). Serial
+stages compare mask/value against a 32 bit shift register of the stage
+channel, with the newest sample in bit 0.
+
+Per stage matching is vectorized, only the (few) stage matches that
+change the trigger level are walked in python. Captures should be
+oldest sample first.
+"""
+
+import numpy
+
+from . import parse
+from .. import settings as settings_module
+
+
+def _stages(triggers):
+    if hasattr(triggers, 'stages'):
+        triggers = triggers.stages
+    if isinstance(triggers, dict):
+        triggers = [triggers, ]
+    stages = []
+    for t in triggers:
+        s = settings_module.no_trigger.copy()
+        s.update(t)
+        stages.append(s)
+    return stages
+
+
+def shift_register(bits, n_bits=32):
+    """Value of an n_bits shift register of bits at each sample"""
+    n = len(bits)
+    bits = bits.astype('uint32')
+    sr = numpy.zeros(n, dtype='uint32')
+    for k in xrange(min(n_bits, n)):
+        sr[k:] |= bits[:n - k] << k
+    return sr
+
+
+class Trigger(object):
+    def __init__(self, triggers):
+        self.stages = _stages(triggers)
+
+    def matches(self, data):
+        """Sample indices where each stage matches (before delay)"""
+        data = parse.as_unsigned(data)
+        m = []
+        for s in self.stages:
+            mask = int(s['mask']) & 0xFFFFFFFF
+            value = int(s['value']) & mask
+            if s['serial']:
+                v = shift_register((data >> int(s['channel'])) & 0b1)
+            else:
+                v = data
+            m.append(numpy.flatnonzero((v & mask) == value))
+        return m
+
+    def find(self, data):
+        """Trigger positions (match index + delay) in data"""
+        matches = self.matches(data)
+        delays = [int(s['delay']) for s in self.stages]
+        levels = [int(s['level']) for s in self.stages]
+        starts = [bool(s['start']) for s in self.stages]
+        n = len(data)
+        # if no stage can advance the level, only level 0 stages fire
+        if not any(
+                (not st) and (lv == 0)
+                for (st, lv) in zip(starts, levels)):
+            r = [
+                m + d for (m, d, lv) in zip(matches, delays, levels)
+                if lv == 0]
+            if not len(r):
+                return numpy.zeros(0, dtype='int64')
+            r = numpy.unique(numpy.concatenate(r))
+            return r[r < n]
+        r = []
+        level = 0
+        pos = 0
+        while True:
+            best = None
+            for (i, m) in enumerate(matches):
+                if levels[i] > level:
+                    continue
+                j = numpy.searchsorted(m, pos, 'left')
+                if j < len(m) and (best is None or m[j] < best[0]):
+                    best = (m[j], i)
+            if best is None:
+                break
+            p, i = best
+            fire = p + delays[i]
+            if fire >= n:
+                break
+            if starts[i]:
+                r.append(fire)
+                level = 0
+                pos = p + 1
+            else:
+                level += 1
+                pos = fire + 1
+        return numpy.array(r, dtype='int64')
+
+
+def find(data, triggers):
+    """All trigger positions in a capture"""
+    return Trigger(triggers).find(data)
+
+
+def find_many(captures, triggers):
+    """All trigger positions in each of several captures"""
+    t = Trigger(triggers)
+    return [t.find(c) for c in captures]
@@ -0,0 +1,89 @@
+#!/usr/bin/env python
+"""
+UART decoding
+
+Frames are found from falling (start bit) edges and every bit of every
+frame is sampled at its middle with one batched index. Returns a record
+array with one record per frame:
+    start_sample: sample index of the start bit edge
+    byte: data bits
+    parity_error: parity bit did not match
+    framing_error: a stop bit was low
+"""
+
+import numpy
+
+from . import parse
+
+
+def _chain(nxt):
+    """Indices visited following nxt from 0 (nxt[i] == len(nxt) ends)"""
+    n = len(nxt)
+    if not n:
+        return numpy.zeros(0, dtype='int64')
+    jump = numpy.append(nxt, n)
+    visited = numpy.zeros(1, dtype='int64')
+    # double the number of steps covered on each pass
+    while True:
+        visited = numpy.union1d(visited, jump[visited])
+        if (jump[visited] == n).all():
+            break
+        jump = jump[jump]
+    return visited[visited < n]
+
+
+def decode(
+        capture, channel, baud, sample_rate=None, data_bits=8,
+        parity=None, stop_bits=1, lsb_first=True, inverted=False):
+    """
+    Decode UART frames on one channel of a capture (oldest sample first)
+
+    capture can be an array or a sump2.capture.Capture, in which case
+    sample_rate defaults to capture.settings.sample_rate (known once
+    settings.max_sample_rate is set, as OLS does when reading metadata).
+    parity can be None, 'even' or 'odd'.
+    """
+    if sample_rate is None:
+        sample_rate = getattr(
+            getattr(capture, 'settings', None), 'sample_rate', None)
+        if sample_rate is None:
+            raise ValueError("sample_rate is required")
+    data = parse.as_unsigned(getattr(capture, 'raw', capture))
+    if parity not in (None, 'even', 'odd'):
+        raise ValueError("Invalid parity: %s" % (parity, ))
+    line = ((data >> channel) & 0b1).astype(bool)
+    if inverted:
+        line = ~line
+    n = len(line)
+    spb = sample_rate / float(baud)
+    n_bits = 1 + data_bits + int(parity is not None) + stop_bits
+    # sample offsets of the middle of each bit, from the start bit edge
+    offsets = (numpy.arange(n_bits) + 0.5) * spb
+
+    # candidate start bits: falling edges still low half a bit later
+    starts = numpy.flatnonzero(line[:-1] & ~line[1:]) + 1
+    starts = starts[starts + int(offsets[-1]) < n]
+    starts = starts[~line[starts + int(offsets[0])]]
+    # a new frame can start after the middle of the last stop bit
+    nxt = numpy.searchsorted(starts, starts + offsets[-1], 'left')
+    starts = starts[_chain(nxt)]
+
+    bits = line[(starts[:, numpy.newaxis] + offsets).astype('int64')]
+    data_slice = bits[:, 1:1 + data_bits]
+    weights = 1 << numpy.arange(data_bits, dtype='int64')
+    if not lsb_first:
+        weights = weights[::-1]
+    r = numpy.empty(len(starts), dtype=[
+        ('start_sample', 'int64'),
+        ('byte', parse.field_dtype(data_bits)),
+        ('parity_error', bool),
+        ('framing_error', bool)])
+    r['start_sample'] = starts
+    r['byte'] = data_slice.dot(weights)
+    if parity is None:
+        r['parity_error'] = False
+    else:
+        ones = bits[:, 1:2 + data_bits].sum(axis=1)
+        r['parity_error'] = (ones % 2) != (parity == 'odd')
+    r['framing_error'] = ~bits[:, n_bits - stop_bits:].all(axis=1)
+    return r
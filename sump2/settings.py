@@ -33,8 +33,14 @@ default_settings = {
     'max_channel_groups': 4,
     'external': False,
     'inverted': False,
+    'rle': False,
+    'extended_counts': False,
+    'max_sample_rate': None,
 }
 
+# largest read/delay count that fits the 16 bit count command
+max_short_count = 0x10000 * 4
+
 no_trigger = {
     'mask': 0,
     'value': 0,
@@ -58,6 +64,22 @@ settings_op_codes = {
     'divider': '\x80',
     'count': '\x81',
     'flags': '\x82',
+    'delay_count': '\x83',
+    'read_count': '\x84',
+}
+
+# command group packed by each Settings attribute
+settings_groups = {
+    'divider': 'divider',
+    'read_count': 'count',
+    'delay_count': 'count',
+    'extended_counts': 'count',
+    'demux': 'flags',
+    'filter': 'flags',
+    'channel_groups': 'flags',
+    'external': 'flags',
+    'inverted': 'flags',
+    'rle': 'flags',
 }
 
 
@@ -68,6 +90,8 @@ class Triggers(object):
         else:
             self.n_stages = n_stages
         self.trigger_type = None
+        # stage index: (stage items, packed stage)
+        self._packed = {}
         if triggers is None:
             self.disable()
         if isinstance(triggers, (list, tuple)):
@@ -131,12 +155,31 @@ class Triggers(object):
             '<ci', trigger_op_codes['value'][stage_index], int(stage['value']))
         return msg
 
+    def pack_stage(self, stage_index):
+        """Pack a stage, reusing the last packed bytes if it is unchanged"""
+        key = tuple(sorted(self.stages[stage_index].items()))
+        cached = self._packed.get(stage_index, None)
+        if cached is not None and cached[0] == key:
+            return cached[1]
+        msg = self._pack_stage(stage_index)
+        self._packed[stage_index] = (key, msg)
+        return msg
+
     def pack(self):
-        return ''.join([self._pack_stage(i) for i in xrange(self.n_stages)])
+        return ''.join([self.pack_stage(i) for i in xrange(self.n_stages)])
 
 
 class Settings(object):
+    """
+    Device settings
+
+    Packed commands are cached per command group (divider, trigger
+    stages, count, flags) and a group is only re-packed after one of its
+    attributes changes (see pack_groups).
+    """
     def __init__(self, settings=None, triggers=None):
+        # command group: packed bytes
+        object.__setattr__(self, '_packed', {})
         if settings is None:
             settings = {}
         s = default_settings.copy()
@@ -149,9 +192,40 @@ class Settings(object):
         self.channel_groups = s['channel_groups']
         self.external = s['external']
         self.inverted = s['inverted']
+        self.rle = s['rle']
+        self.extended_counts = s['extended_counts']
         self.max_channel_groups = s['max_channel_groups']
+        # undivided sample rate (Hz) if known, see sample_rate
+        self.max_sample_rate = s['max_sample_rate']
         if not isinstance(triggers, Triggers):
-            self.triggers = Triggers(triggers)
+            triggers = Triggers(triggers)
+        self.triggers = triggers
+
+    @property
+    def sample_rate(self):
+        """
+        Sample rate (Hz), doubled in demux mode
+
+        None if max_sample_rate is unknown.
+        """
+        if self.max_sample_rate is None:
+            return None
+        rate = self.max_sample_rate / float(self.divider)
+        if self.demux:
+            rate *= 2
+        return rate
+
+    def __setattr__(self, name, value):
+        group = settings_groups.get(name, None)
+        if group is not None and getattr(self, name, None) != value:
+            self._packed.pop(group, None)
+        object.__setattr__(self, name, value)
+
+    def _pack_group(self, group, pack):
+        if group not in self._packed:
+            msg = pack()
+            self._packed[group] = msg
+        return self._packed[group]
 
     def _pack_divider(self):
         d = self.divider - 1
@@ -164,22 +238,40 @@ class Settings(object):
         if delay_count == 0, trigger value should be in sample [0-3]
         if delay_count == read_count, it's possible
             the trigger value would NOT be present (1 beyond samples)
+
+        if extended_counts, send separate 32 bit read and delay counts
         """
         rc = self.read_count // 4
         self.read_count = rc * 4
         dc = self.delay_count // 4
         self.delay_count = dc * 4
         rc -= 1  # might be OLS specific
+        if self.extended_counts:
+            return (
+                struct.pack('<cI', settings_op_codes['read_count'], rc) +
+                struct.pack('<cI', settings_op_codes['delay_count'], dc))
+        if rc > 0xFFFF or dc > 0xFFFF:
+            raise ValueError(
+                "read/delay count [%s/%s] requires extended_counts" %
+                (self.read_count, self.delay_count))
         return struct.pack('<cHH', settings_op_codes['count'], rc, dc)
 
     def _pack_flags(self):
         return struct.pack(
-            '<cBxxx', settings_op_codes['flags'],
+            '<cBBxx', settings_op_codes['flags'],
             (int(self.inverted) << 7) | (int(self.external) << 6) |
             (int(self.channel_groups) << 2) | (int(self.filter) << 1) |
-            int(self.demux))
+            int(self.demux),
+            int(self.rle))
+
+    def pack_groups(self):
+        """Packed commands as a list of (command group, bytes)"""
+        groups = [('divider', self._pack_group('divider', self._pack_divider))]
+        for i in xrange(self.triggers.n_stages):
+            groups.append(('trigger%i' % i, self.triggers.pack_stage(i)))
+        groups.append(('count', self._pack_group('count', self._pack_count)))
+        groups.append(('flags', self._pack_group('flags', self._pack_flags)))
+        return groups
 
     def pack(self):
-        return ''.join((
-            self._pack_divider(), self.triggers.pack(),
-            self._pack_count(), self._pack_flags()))
+        return ''.join([msg for (_, msg) in self.pack_groups()])
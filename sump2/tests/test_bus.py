@@ -0,0 +1,85 @@
+#!/usr/bin/env python
+
+import unittest
+
+import numpy
+
+from sump2.ops import bus
+
+
+def sample(address=0, data=0, dbin=False, wr=False):
+    """One 8080 bus sample (/WR is active low)"""
+    return address | (data << 16) | (int(dbin) << 28) | (int(not wr) << 29)
+
+
+class Bus(object):
+    """Synthesize 8080 bus cycles"""
+    def __init__(self):
+        self.samples = [sample()] * 3
+
+    def read(self, address, data):
+        # data only becomes valid late in the cycle
+        self.samples += [sample(address, 0xEE, dbin=True)] * 2
+        self.samples += [sample(address, data, dbin=True)] * 2
+        self.samples += [sample(address + 1)] * 3
+
+    def write(self, address, data):
+        self.samples += [sample(address, 0xEE, wr=True)]
+        self.samples += [sample(address, data, wr=True)] * 3
+        self.samples += [sample(address + 1, 0xEE)] * 3
+
+    def capture(self):
+        return numpy.array(self.samples, dtype='uint32')
+
+
+class CyclesTest(unittest.TestCase):
+    def test_cycles(self):
+        b = Bus()
+        b.read(0x0000, 0x3E)
+        b.read(0x0001, 0x42)
+        b.write(0x2000, 0x42)
+        b.read(0x0002, 0xC9)
+        r = bus.cycles(b.capture())
+        self.assertEqual(list(r['address']), [0, 1, 0x2000, 2])
+        self.assertEqual(list(r['data']), [0x3E, 0x42, 0x42, 0xC9])
+        self.assertEqual(list(r['write']), [False, False, True, False])
+        # strobes in sorted name order: dbin, wr
+        self.assertEqual(list(r['strobe']), [0, 0, 1, 0])
+        self.assertEqual(list(r['start']), [3, 10, 17, 24])
+        self.assertEqual(list(r['end']), [7, 14, 21, 28])
+
+    def test_spec(self):
+        # 4 bit address, 4 bit data, active low read, active high write
+        spec = {'address': (0, 4), 'data': (4, 4), 'rd': 8, 'we': 9}
+        strobes = {'rd': ('read', False), 'we': ('write', True)}
+        d = [0x100, 0x1A5, 0x0A5, 0x0A5, 0x1A5, 0x103, 0x373, 0x103]
+        r = bus.cycles(numpy.array(d, dtype='uint16'), spec, strobes)
+        self.assertEqual(list(r['address']), [5, 3])
+        self.assertEqual(list(r['data']), [0xA, 0x7])
+        self.assertEqual(list(r['write']), [False, True])
+        self.assertEqual(r['address'].dtype, numpy.uint8)
+        self.assertRaises(
+            ValueError, bus.cycles, numpy.array(d, dtype='uint16'), spec,
+            {'rd': ('fetch', False)})
+
+    def test_truncated(self):
+        # cycles cut off at either end of the capture are dropped
+        b = Bus()
+        b.read(0x0000, 0x3E)
+        b.write(0x1000, 0x01)
+        b.read(0x0001, 0x42)
+        c = b.capture()
+        r = bus.cycles(c[5:-6])
+        self.assertEqual(list(r['address']), [0x1000])
+        self.assertEqual(list(r['start']), [5])
+
+    def test_empty(self):
+        for n in (0, 1, 10):
+            r = bus.cycles(numpy.zeros(n, dtype='uint32') + sample())
+            self.assertEqual(len(r), 0)
+            self.assertEqual(r.dtype.names, (
+                'start', 'end', 'address', 'data', 'write', 'strobe'))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,114 @@
+#!/usr/bin/env python
+
+import random
+import unittest
+
+import numpy
+
+from sump2.devices import rs232
+
+
+class FakePort(object):
+    """Serial port that sends random bytes for each capture command"""
+    def __init__(self, *args, **kwargs):
+        self.rx = ''
+        self.n_bytes = 0
+        self.sent = []
+        self.random = random.Random(0)
+
+    def write(self, s):
+        if s.endswith('\x01'):
+            b = ''.join(
+                chr(self.random.getrandbits(8))
+                for _ in xrange(self.n_bytes))
+            self.sent.append(b)
+            self.rx += b
+
+    def read(self, n=1):
+        r, self.rx = self.rx[:n], self.rx[n:]
+        return r
+
+    def inWaiting(self):
+        return len(self.rx)
+
+    def flushInput(self):
+        self.rx = ''
+
+    def close(self):
+        pass
+
+
+def reference(buf, channel_groups, dtype, n_samples=100):
+    """Unpack a capture one byte at a time (as RS232Sump originally did)"""
+    offsets = [8 * i for i in xrange(4) if not channel_groups & (0b1 << i)]
+    mask = (1 << (numpy.dtype(dtype).itemsize * 8)) - 1
+    d = []
+    i = 0
+    for _ in xrange(n_samples):
+        v = 0
+        for o in offsets:
+            v |= ord(buf[i]) << o
+            i += 1
+        d.append(v & mask)
+    return d
+
+
+class CaptureTest(unittest.TestCase):
+    def setUp(self):
+        self.serial = rs232.serial.Serial
+        rs232.serial.Serial = FakePort
+
+    def tearDown(self):
+        rs232.serial.Serial = self.serial
+
+    def device(self, channel_groups, read_count=100):
+        d = rs232.RS232Sump(settings={
+            'read_count': read_count, 'channel_groups': channel_groups})
+        n_groups = 4 - bin(channel_groups).count('1')
+        d.port.n_bytes = read_count * n_groups
+        return d
+
+    def test_capture(self):
+        # every group mask, including gapped ones, and chunk sizes that
+        # don't divide read_count
+        for channel_groups in xrange(16):
+            d = self.device(channel_groups)
+            for chunk_samples in (1, 7, 33, 100, 65536):
+                c = d.capture(chunk_samples=chunk_samples)
+                self.assertEqual(
+                    list(c),
+                    reference(d.port.sent[-1], channel_groups, c.dtype),
+                    (channel_groups, chunk_samples))
+
+    def test_capture_out(self):
+        d = self.device(0b0101)
+        out = numpy.zeros(100, dtype='uint32')
+        c = d.capture(chunk_samples=33, out=out)
+        self.assertIs(c, out)
+        self.assertEqual(
+            list(out), reference(d.port.sent[-1], 0b0101, out.dtype))
+
+    def test_capture_iter(self):
+        for channel_groups in (0b0000, 0b0110, 0b1011):
+            d = self.device(channel_groups)
+            for oldest_first in (False, True):
+                chunks = list(d.capture_iter(33, oldest_first))
+                ref = reference(
+                    d.port.sent[-1], channel_groups, chunks[0][1].dtype)
+                if oldest_first:
+                    ref = ref[::-1]
+                out = numpy.zeros(100, dtype='uint32')
+                for (offset, chunk) in chunks:
+                    out[offset:offset + len(chunk)] = chunk
+                self.assertEqual(list(out), ref)
+
+    def test_capture_repeat(self):
+        d = self.device(0b1001)
+        captures = [c for (c, _) in d.capture_repeat(3, chunk_samples=33)]
+        self.assertEqual(len(captures), 3)
+        for (c, sent) in zip(captures, d.port.sent):
+            self.assertEqual(list(c), reference(sent, 0b1001, c.dtype))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,113 @@
+#!/usr/bin/env python
+
+import unittest
+
+import numpy
+
+from sump2.ops import i2c
+
+
+class Bus(object):
+    """Synthesize I2C (scl on channel 0, sda on channel 1)"""
+    def __init__(self):
+        self.samples = [(1, 1)] * 4
+
+    def _add(self, scl, sda, n=2):
+        self.samples += [(scl, sda)] * n
+
+    def start(self):
+        # (repeated) start: release sda with scl low, then pull it low
+        # while scl is high
+        self._add(0, 1)
+        self._add(1, 1)
+        self._add(1, 0)
+        self._add(0, 0)
+
+    def stop(self):
+        self._add(0, 0)
+        self._add(1, 0)
+        self._add(1, 1, 4)
+
+    def bits(self, bits):
+        for b in bits:
+            self._add(0, b)
+            self._add(1, b)
+            self._add(0, b)
+
+    def byte(self, v, ack=True):
+        self.bits([(v >> i) & 0b1 for i in xrange(7, -1, -1)] + [not ack])
+
+    def capture(self):
+        return numpy.array(
+            [scl | (sda << 1) for (scl, sda) in self.samples],
+            dtype='uint32')
+
+
+class I2CTest(unittest.TestCase):
+    def test_decode(self):
+        bus = Bus()
+        bus.start()
+        bus.byte(0x50 << 1)
+        bus.byte(0x12)
+        bus.byte(0x34)
+        # repeated start, read
+        bus.start()
+        bus.byte((0x50 << 1) | 0b1)
+        bus.byte(0xAB)
+        bus.byte(0xCD, ack=False)
+        bus.stop()
+        # nack'ed address
+        bus.start()
+        bus.byte(0x21 << 1, ack=False)
+        bus.stop()
+        r = i2c.decode(bus.capture(), 0, 1)
+        self.assertEqual(list(r['transaction']), [0, 0, 0, 1, 1, 1, 2])
+        self.assertEqual(list(r['index']), [0, 1, 2, 0, 1, 2, 0])
+        self.assertEqual(list(r['address']), [0x50] * 6 + [0x21])
+        self.assertEqual(
+            list(r['read']), [False] * 3 + [True] * 3 + [False])
+        self.assertEqual(
+            list(r['data']), [0xA0, 0x12, 0x34, 0xA1, 0xAB, 0xCD, 0x42])
+        self.assertEqual(
+            list(r['ack']), [True] * 5 + [False, False])
+        # sample is the scl rising edge of the first bit
+        c = bus.capture()
+        for s in r['sample']:
+            self.assertEqual((c[s - 1] & 0b1, c[s] & 0b1), (0, 1))
+
+    def test_truncated(self):
+        bus = Bus()
+        bus.start()
+        bus.byte(0x50 << 1)
+        bus.byte(0x12)
+        # byte cut off after 5 bits
+        bus.bits([1, 0, 1, 0, 1])
+        r = i2c.decode(bus.capture(), 0, 1)
+        self.assertEqual(list(r['data']), [0xA0, 0x12])
+        # a byte interrupted by a stop is dropped
+        bus.stop()
+        bus.start()
+        bus.byte(0x33 << 1)
+        bus.stop()
+        r = i2c.decode(bus.capture(), 0, 1)
+        self.assertEqual(list(r['data']), [0xA0, 0x12, 0x66])
+        self.assertEqual(list(r['transaction']), [0, 0, 1])
+        # clock edges before the first start are ignored
+        bus = Bus()
+        bus.bits([1, 0, 1])
+        bus.start()
+        bus.byte(0x10)
+        self.assertEqual(list(i2c.decode(bus.capture(), 0, 1)['data']),
+                         [0x10])
+
+    def test_empty(self):
+        for n in (0, 1, 10):
+            r = i2c.decode(numpy.zeros(n, dtype='uint32') + 0b11, 0, 1)
+            self.assertEqual(len(r), 0)
+            self.assertEqual(r.dtype.names, (
+                'sample', 'transaction', 'index', 'address', 'read',
+                'data', 'ack'))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,169 @@
+#!/usr/bin/env python
+
+import copy
+import random
+import unittest
+
+import numpy
+
+from sump2.capture import changes
+from sump2.ops import parse
+
+
+capture_dtypes = ['uint8', 'uint16', 'uint32', 'uint64', 'int32', 'int64']
+
+
+def reference_bits(spec):
+    """Field bits (lsb first) and signedness of a spec"""
+    if isinstance(spec, tuple):
+        return range(spec[0], spec[0] + spec[1]), False
+    if isinstance(spec, dict):
+        if 'bits' in spec:
+            bits = list(spec['bits'])
+        else:
+            bits = range(spec['start'], spec['start'] + spec['length'])
+        if spec.get('order', 'lsb') == 'msb':
+            bits = bits[::-1]
+        return bits, spec.get('signed', False)
+    return [spec], False
+
+
+def reference(data, spec):
+    """Unpack a field one bit of one sample at a time"""
+    bits, signed = reference_bits(spec)
+    n_bits = data.dtype.itemsize * 8
+    r = []
+    for v in data:
+        v = int(v) & ((1 << n_bits) - 1)
+        f = 0
+        for (i, b) in enumerate(bits):
+            f |= ((v >> b) & 0b1) << i
+        if signed and f & (1 << (len(bits) - 1)):
+            f -= 1 << len(bits)
+        r.append(f)
+    return r
+
+
+def random_capture(dtype, n=200):
+    dtype = numpy.dtype(dtype)
+    r = random.Random(dtype.str)
+    raw = [r.getrandbits(dtype.itemsize * 8) for _ in xrange(n)]
+    raw = numpy.array(raw, dtype='uint64')
+    return raw.astype(dtype.str.replace('i', 'u')).view(dtype)
+
+
+specs = [
+    0,
+    5,
+    (0, 8),
+    (3, 5),
+    (4, 12),
+    (0, 32),
+    (30, 4),
+    (60, 4),
+    {'bits': [7, 3, 12, 13]},
+    {'bits': [7, 3, 12, 13], 'order': 'msb'},
+    {'bits': [7, 3, 12, 13], 'order': 'msb', 'signed': True},
+    {'start': 2, 'length': 6, 'signed': True},
+    {'start': 0, 'length': 8, 'order': 'msb'},
+    {'bits': range(16)[::-1]},
+    {'bits': [0, 2, 4, 6, 8, 10, 12, 14, 16]},
+    {'bits': [1, 40]},
+    {'start': 8, 'length': 40},
+    {'start': 0, 'length': 64},
+]
+
+
+class FieldTest(unittest.TestCase):
+    def test_unpack(self):
+        for dtype in capture_dtypes:
+            data = random_capture(dtype)
+            for spec in specs:
+                v = parse.unpack(data, spec)
+                self.assertEqual(
+                    list(v), reference(data, spec), (dtype, spec))
+                bits, signed = reference_bits(spec)
+                self.assertEqual(
+                    v.dtype, parse.field_dtype(len(bits), signed))
+
+    def test_field_dtype(self):
+        self.assertEqual(parse.field_dtype(1), numpy.uint8)
+        self.assertEqual(parse.field_dtype(8), numpy.uint8)
+        self.assertEqual(parse.field_dtype(9), numpy.uint16)
+        self.assertEqual(parse.field_dtype(33), numpy.uint64)
+        self.assertEqual(parse.field_dtype(6, True), numpy.int8)
+        self.assertRaises(ValueError, parse.field_dtype, 65)
+
+    def test_invalid(self):
+        self.assertRaises(ValueError, parse.Field, (0, 1, 2))
+        self.assertRaises(ValueError, parse.Field, {'bits': []})
+        self.assertRaises(
+            ValueError, parse.Field, {'bits': [0], 'order': 'middle'})
+
+
+class ParseTest(unittest.TestCase):
+    def setUp(self):
+        self.settings = {
+            'address': (0, 16),
+            'data': (16, 8),
+            'litfin': 24,
+            'o2': 31,
+            'scattered': {'bits': [30, 3, 17], 'order': 'msb'},
+            'signed': {'start': 4, 'length': 4, 'signed': True},
+        }
+
+    def test_record(self):
+        for dtype in capture_dtypes:
+            data = random_capture(dtype)
+            r = parse.parse(data, self.settings)
+            self.assertEqual(len(r), len(data))
+            for (k, spec) in self.settings.items():
+                self.assertEqual(list(r[k]), reference(data, spec))
+
+    def test_columnar(self):
+        data = random_capture('uint32')
+        r = parse.parse(data, self.settings, columnar=True)
+        record = parse.parse(data, self.settings)
+        self.assertEqual(sorted(r), sorted(self.settings))
+        for k in r:
+            self.assertEqual(r[k].dtype, record.dtype[k])
+            self.assertTrue((r[k] == record[k]).all())
+
+    def test_kwargs(self):
+        data = random_capture('uint32')
+        r = parse.parse(data, {'address': (0, 16)}, data=(16, 8))
+        self.assertEqual(sorted(r.dtype.names), ['address', 'data'])
+        self.assertEqual(list(r['data']), reference(data, (16, 8)))
+
+    def test_settings_not_mutated(self):
+        settings = copy.deepcopy(self.settings)
+        data = random_capture('uint32')
+        parse.parse(data, settings, extra=1)
+        parse.parse_many([data, data], settings)
+        self.assertEqual(settings, self.settings)
+
+    def test_spec(self):
+        spec = parse.Spec(self.settings)
+        captures = [random_capture(dt) for dt in ('uint32', 'int64')]
+        for (c, r) in zip(captures, parse.parse_many(captures, spec)):
+            for (k, s) in self.settings.items():
+                self.assertEqual(list(r[k]), reference(c, s))
+
+    def test_change_list(self):
+        data = numpy.repeat(random_capture('uint32', 20), 3)
+        cl = changes.ChangeList.from_dense(data)
+        r = parse.parse(cl, self.settings)
+        self.assertTrue(isinstance(r, changes.ChangeList))
+        dense = parse.parse(data, self.settings)
+        self.assertTrue((r.to_dense() == dense).all())
+        r = parse.parse(cl, self.settings, columnar=True)
+        for k in self.settings:
+            self.assertTrue((r[k].to_dense() == dense[k]).all())
+
+    def test_empty(self):
+        r = parse.parse(numpy.zeros(0, dtype='uint32'), self.settings)
+        self.assertEqual(len(r), 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,54 @@
+#!/usr/bin/env python
+
+import unittest
+
+import numpy
+
+from sump2.ops import rle
+
+
+class RLETest(unittest.TestCase):
+    def test_32_bit(self):
+        flag = 0x1 << 31
+        samples = numpy.array(
+            [5, flag | 3, 7, 0x7FFFFFFF, flag | 0x100], dtype='uint32')
+        values, durations = rle.split(samples)
+        self.assertEqual(list(values), [5, 7, 0x7FFFFFFF])
+        self.assertEqual(list(durations), [4, 1, 0x101])
+        d = rle.expand(samples)
+        self.assertEqual(len(d), 4 + 1 + 0x101)
+        self.assertEqual(list(d[:6]), [5, 5, 5, 5, 7, 0x7FFFFFFF])
+        timestamps, values = rle.changes(samples)
+        self.assertEqual(list(timestamps), [0, 4, 5])
+        self.assertEqual(list(values), [5, 7, 0x7FFFFFFF])
+
+    def test_gapped_groups(self):
+        # only channel group 1 enabled, samples at bits 8-15
+        offsets = [8]
+        self.assertEqual(rle.flag_bit(offsets), 15)
+        samples = numpy.array(
+            [0x1200, 0x8200, 0x3400, 0x5600, 0xFF00], dtype='uint32')
+        values, durations = rle.split(samples, offsets)
+        self.assertEqual(list(values), [0x1200, 0x3400, 0x5600])
+        self.assertEqual(list(durations), [3, 1, 0x80])
+        self.assertEqual(
+            list(rle.expand(samples, offsets)),
+            [0x1200] * 3 + [0x3400] + [0x5600] * 0x80)
+
+    def test_leading_count_word(self):
+        # a count word without a preceding value is dropped
+        flag = 0x1 << 31
+        samples = numpy.array([flag | 9, 3, flag | 1, 4], dtype='uint32')
+        values, durations = rle.split(samples)
+        self.assertEqual(list(values), [3, 4])
+        self.assertEqual(list(durations), [2, 1])
+        timestamps, values = rle.changes(samples)
+        self.assertEqual(list(timestamps), [0, 2])
+
+    def test_no_runs(self):
+        samples = numpy.arange(10, dtype='uint32')
+        self.assertEqual(list(rle.expand(samples)), range(10))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,117 @@
+#!/usr/bin/env python
+
+import hashlib
+import unittest
+
+from sump2 import settings
+from sump2.devices import rs232
+from sump2.devices import segmented
+
+
+class FakePort(object):
+    """Serial port that answers each capture command from a script"""
+    def __init__(self, *args, **kwargs):
+        self.rx = ''
+        # bytes sent for each capture (None for no trigger or an
+        # exception raised by the next read)
+        self.captures = []
+        self.error = None
+        self.n_bytes = 0
+        # called with the number of captures armed so far
+        self.on_arm = None
+        self.n_armed = 0
+
+    def write(self, s):
+        if not s.endswith('\x01'):
+            return
+        self.n_armed += 1
+        if self.on_arm is not None:
+            self.on_arm(self.n_armed)
+        if len(self.captures):
+            c = self.captures.pop(0)
+            if isinstance(c, Exception):
+                self.error = c
+            elif c is not None:
+                self.rx += chr(c) * self.n_bytes
+
+    def read(self, n=1):
+        if self.error is not None:
+            raise self.error
+        r, self.rx = self.rx[:n], self.rx[n:]
+        return r
+
+    def inWaiting(self):
+        return len(self.rx)
+
+    def flushInput(self):
+        self.rx = ''
+
+    def close(self):
+        pass
+
+
+class SegmentedAcquisitionTest(unittest.TestCase):
+    def setUp(self):
+        self.serial = rs232.serial.Serial
+        rs232.serial.Serial = FakePort
+        self.device = rs232.RS232Sump(
+            settings={'read_count': 16, 'channel_groups': 0b1110})
+        self.device.port.n_bytes = 16
+
+    def tearDown(self):
+        rs232.serial.Serial = self.serial
+
+    def acquire(self, captures, n_segments):
+        self.device.port.captures = captures
+        a = segmented.SegmentedAcquisition(
+            self.device, n_segments, max_timeouts=2)
+        a.start()
+        # stops after the script runs out (2 timeouts in a row)
+        a._thread.join(10)
+        self.assertFalse(a.running)
+        return a
+
+    def test_latest(self):
+        a = self.acquire([1, 2, 3, 4, 5], 4)
+        self.assertEqual(a.count, 5)
+        latest = a.latest(10)
+        self.assertEqual([s for (s, _, _, _) in latest], [4, 3, 2])
+        for (s, t, h, d) in latest:
+            self.assertTrue((d == s + 1).all())
+            self.assertTrue(a.valid(s))
+        self.assertFalse(a.valid(1))
+
+    def test_timeout(self):
+        a = self.acquire([1, 2, None, 3, 4, None, 5], 3)
+        self.assertEqual(a.count, 5)
+        self.assertEqual(a.timeouts, 4)
+        latest = a.latest(10)
+        self.assertEqual([s for (s, _, _, _) in latest], [4, 3])
+        for (s, t, h, d) in latest:
+            self.assertTrue((d == s + 1).all())
+
+    def test_port_error(self):
+        # errors other than read timeouts stop the acquisition
+        error = IOError("device disconnected")
+        a = self.acquire([1, 2, error], 4)
+        self.assertEqual(a.count, 2)
+        self.assertEqual(a.timeouts, 0)
+        self.assertIs(a.error, error)
+
+    def test_settings_hash(self):
+        def on_arm(n_armed):
+            # change settings after the second capture is armed
+            if n_armed == 2:
+                self.device.settings.divider = 5
+        self.device.port.on_arm = on_arm
+        a = self.acquire([1, 2, 3], 4)
+        s = settings.Settings({'read_count': 16, 'channel_groups': 0b1110})
+        h2 = hashlib.sha1(s.pack()).hexdigest()
+        s.divider = 5
+        h5 = hashlib.sha1(s.pack()).hexdigest()
+        self.assertEqual(
+            [h for (_, _, h, _) in a.latest(3)], [h5, h2, h2])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,112 @@
+#!/usr/bin/env python
+
+import unittest
+
+import numpy
+
+from sump2.ops import spi
+
+
+def bits(word, word_size=8, lsb_first=False):
+    b = [(word >> i) & 0b1 for i in xrange(word_size)]
+    if not lsb_first:
+        b = b[::-1]
+    return b
+
+
+class Bus(object):
+    """Synthesize SPI (sclk 0, mosi 1, miso 2, cs 3 [active low])"""
+    def __init__(self, mode=0):
+        self.cpol, self.cpha = mode >> 1, mode & 0b1
+        self.samples = []
+        self.idle(4)
+
+    def _add(self, clk, mosi=0, miso=0, cs=1, n=1):
+        self.samples += [clk | (mosi << 1) | (miso << 2) | (cs << 3)] * n
+
+    def idle(self, n=2, cs=1):
+        self._add(self.cpol, cs=cs, n=n)
+
+    def transfer(self, mosi, miso, cs=True):
+        """Shift out mosi and miso (lists of bits)"""
+        c = int(not cs)
+        self.idle(cs=c)
+        active = int(not self.cpol)
+        for (o, i) in zip(mosi, miso):
+            if self.cpha:
+                # data changes on the leading edge, sampled on trailing
+                self._add(active, o, i, c, 2)
+                self._add(self.cpol, o, i, c, 2)
+            else:
+                self._add(self.cpol, o, i, c, 2)
+                self._add(active, o, i, c, 2)
+        self.idle(cs=c)
+        self.idle(4)
+
+    def capture(self):
+        return numpy.array(self.samples, dtype='uint32')
+
+
+class SPITest(unittest.TestCase):
+    def test_modes(self):
+        for mode in xrange(4):
+            bus = Bus(mode)
+            bus.transfer(bits(0x9F) + bits(0x00), bits(0x00) + bits(0xEF))
+            bus.transfer(bits(0x03), bits(0x5A))
+            r = spi.decode(bus.capture(), 0, 1, 2, 3, mode=mode)
+            self.assertEqual(list(r['mosi']), [0x9F, 0x00, 0x03], mode)
+            self.assertEqual(list(r['miso']), [0x00, 0xEF, 0x5A], mode)
+            self.assertEqual(list(r['transfer']), [0, 0, 1])
+            self.assertTrue((r['end_sample'] > r['start_sample']).all())
+
+    def test_options(self):
+        bus = Bus()
+        bus.transfer(bits(0x123, 12, True), bits(0xABC, 12, True))
+        r = spi.decode(
+            bus.capture(), 0, 1, 2, 3, word_size=12, lsb_first=True)
+        self.assertEqual(list(r['mosi']), [0x123])
+        self.assertEqual(list(r['miso']), [0xABC])
+        self.assertEqual(r['mosi'].dtype, numpy.uint16)
+        # only mosi, no cs
+        r = spi.decode(bus.capture(), 0, 1, word_size=4)
+        self.assertEqual(r.dtype.names, (
+            'start_sample', 'end_sample', 'transfer', 'mosi'))
+        self.assertEqual(list(r['mosi']), [0xC, 0x4, 0x8])
+        # active high cs
+        bus = Bus()
+        bus.idle(cs=0)
+        bus.transfer(bits(0x42), bits(0x24), cs=False)
+        r = spi.decode(bus.capture(), 0, 1, 2, 3, cs_active_low=False)
+        self.assertEqual(list(r['mosi']), [0x42])
+
+    def test_truncated(self):
+        # words cut short by cs are dropped
+        bus = Bus()
+        bus.transfer(bits(0x11) + bits(0x22)[:5], bits(0x33) + [1] * 5)
+        bus.transfer(bits(0x44), bits(0x55))
+        r = spi.decode(bus.capture(), 0, 1, 2, 3)
+        self.assertEqual(list(r['mosi']), [0x11, 0x44])
+        self.assertEqual(list(r['transfer']), [0, 1])
+        # as is a word cut off by the end of the capture
+        bus = Bus()
+        bus.transfer(bits(0x11) + bits(0x22), bits(0x33) + bits(0x66))
+        c = bus.capture()[:-20]
+        r = spi.decode(c, 0, 1, 2, 3)
+        self.assertEqual(list(r['mosi']), [0x11])
+
+    def test_empty(self):
+        for n in (0, 1, 10):
+            r = spi.decode(
+                numpy.zeros(n, dtype='uint32') + 0b1000, 0, 1, 2, 3)
+            self.assertEqual(len(r), 0)
+            self.assertEqual(r.dtype.names, (
+                'start_sample', 'end_sample', 'transfer', 'mosi', 'miso'))
+
+    def test_invalid(self):
+        self.assertRaises(
+            ValueError, spi.decode, numpy.zeros(10, dtype='uint32'), 0,
+            mode=4)
+
+
+if __name__ == '__main__':
+    unittest.main()
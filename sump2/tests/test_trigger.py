@@ -0,0 +1,81 @@
+#!/usr/bin/env python
+
+import random
+import unittest
+
+import numpy
+
+from sump2.ops import trigger
+
+
+def capture(values):
+    return numpy.array(values, dtype='uint32')
+
+
+class TriggerTest(unittest.TestCase):
+    def test_parallel(self):
+        d = capture([0, 1, 2, 3, 0x101, 1])
+        t = {'mask': 0xF, 'value': 1}
+        self.assertEqual(list(trigger.find(d, t)), [1, 4, 5])
+        t['mask'] = 0xFFF
+        self.assertEqual(list(trigger.find(d, t)), [1, 5])
+        # delayed triggers past the end of the capture are dropped
+        t['delay'] = 2
+        self.assertEqual(list(trigger.find(d, t)), [3])
+
+    def test_sequence(self):
+        # stage 0 arms stage 1, stage 1 fires and goes back to level 0
+        stages = [
+            {'mask': 0xFF, 'value': 0xA, 'start': False},
+            {'mask': 0xFF, 'value': 0xB, 'level': 1}]
+        d = capture([0xB, 0xA, 0, 0xB, 0xB, 0xA, 0xB])
+        self.assertEqual(list(trigger.find(d, stages)), [3, 6])
+        # stage 1 never matches after the last arm
+        self.assertEqual(list(trigger.find(d[:-1], stages)), [3])
+        # stage 1 is only armed 3 samples after stage 0 matches
+        stages[0]['delay'] = 3
+        d = capture([0xB, 0xA, 0xB, 0, 0xB, 0xB])
+        self.assertEqual(list(trigger.find(d, stages)), [5])
+
+    def test_serial(self):
+        bits = [1, 0, 1, 1, 0, 1, 0, 0]
+        r = random.Random(0)
+        # noise on the other channels
+        d = capture([
+            (b << 3) | (r.getrandbits(32) & ~0b1000) for b in bits])
+        t = {'serial': True, 'channel': 3, 'mask': 0b111, 'value': 0b101}
+        self.assertEqual(list(trigger.find(d, t)), [2, 5])
+        t['value'] = 0b011
+        self.assertEqual(list(trigger.find(d, t)), [3])
+
+    def test_shift_register(self):
+        r = random.Random(1)
+        bits = numpy.array([r.getrandbits(1) for _ in xrange(100)])
+        for n_bits in (1, 8, 32):
+            sr = trigger.shift_register(bits, n_bits)
+            for i in xrange(len(bits)):
+                v = 0
+                for k in xrange(min(n_bits, i + 1)):
+                    v |= int(bits[i - k]) << k
+                self.assertEqual(sr[i], v)
+        self.assertEqual(len(trigger.shift_register(bits[:0])), 0)
+
+    def test_find_many(self):
+        t = trigger.Trigger({'mask': 0xF, 'value': 1})
+        captures = [capture([1, 0, 1]), capture([]), capture([2, 1])]
+        r = trigger.find_many(captures, t.stages)
+        self.assertEqual([list(p) for p in r], [[0, 2], [], [1]])
+
+    def test_empty(self):
+        for stages in (
+                {'mask': 0xF, 'value': 1},
+                [{'mask': 0xF, 'value': 1, 'start': False},
+                 {'mask': 0xF, 'value': 2, 'level': 1}]):
+            for d in (capture([]), capture([0, 0, 0])):
+                r = trigger.find(d, stages)
+                self.assertEqual(len(r), 0)
+                self.assertEqual(r.dtype, numpy.int64)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,104 @@
+#!/usr/bin/env python
+
+import unittest
+
+import numpy
+
+from sump2.ops import uart
+
+
+def frame(byte, spb, data_bits=8, parity=None, stop=1):
+    """Samples (lsb first) of one frame, spb samples per bit"""
+    bits = [0] + [(byte >> i) & 0b1 for i in xrange(data_bits)]
+    if parity is not None:
+        bits.append((sum(bits) + (parity == 'odd')) % 2)
+    bits.append(stop)
+    return [b for b in bits for _ in xrange(spb)]
+
+
+def line(frames, channel=2, spb=8, idle=5):
+    """Capture (uint32, oldest first) of frames on channel"""
+    samples = [1] * idle
+    for f in frames:
+        samples += f + [1] * idle
+    return numpy.array(samples, dtype='uint32') << channel
+
+
+class UARTTest(unittest.TestCase):
+    def test_decode(self):
+        data = [0x55, 0xA3, 0x00, 0xFF, 0x80]
+        d = line([frame(b, 8) for b in data])
+        r = uart.decode(d, 2, 1000, sample_rate=8000)
+        self.assertEqual(list(r['byte']), data)
+        self.assertFalse(r['parity_error'].any())
+        self.assertFalse(r['framing_error'].any())
+        # start bits, 5 idle samples between 10 bit frames
+        self.assertEqual(
+            list(r['start_sample']), [5 + 85 * i for i in xrange(5)])
+        # other channels are ignored
+        r = uart.decode(d | 0b11, 2, 1000, sample_rate=8000)
+        self.assertEqual(list(r['byte']), data)
+
+    def test_back_to_back(self):
+        # no idle time between frames
+        data = [0x12, 0x34, 0x56]
+        d = line([sum([frame(b, 8) for b in data], [])])
+        r = uart.decode(d, 2, 1000, sample_rate=8000)
+        self.assertEqual(list(r['byte']), data)
+
+    def test_parity(self):
+        for parity in ('even', 'odd'):
+            other = {'even': 'odd', 'odd': 'even'}[parity]
+            d = line([
+                frame(0x31, 8, parity=parity),
+                frame(0x31, 8, parity=other),
+                frame(0x30, 8, parity=parity)])
+            r = uart.decode(d, 2, 1000, sample_rate=8000, parity=parity)
+            self.assertEqual(list(r['byte']), [0x31, 0x31, 0x30])
+            self.assertEqual(list(r['parity_error']), [False, True, False])
+
+    def test_framing_error(self):
+        d = line([frame(0x0F, 8), frame(0x0F, 8, stop=0), frame(0x01, 8)])
+        r = uart.decode(d, 2, 1000, sample_rate=8000)
+        self.assertEqual(list(r['framing_error']), [False, True, False])
+        self.assertEqual(r['byte'][-1], 0x01)
+
+    def test_options(self):
+        d = line([frame(0x15, 8, data_bits=7)])
+        r = uart.decode(d, 2, 1000, sample_rate=8000, data_bits=7)
+        self.assertEqual(list(r['byte']), [0x15])
+        r = uart.decode(
+            d, 2, 1000, sample_rate=8000, data_bits=7, lsb_first=False)
+        self.assertEqual(list(r['byte']), [0b1010100])
+        r = uart.decode(~d, 2, 1000, sample_rate=8000, data_bits=7,
+                        inverted=True)
+        self.assertEqual(list(r['byte']), [0x15])
+
+    def test_truncated(self):
+        # the last frame is cut off in its stop bit
+        d = line([frame(0x41, 8), frame(0x42, 8)], idle=5)[:-13]
+        r = uart.decode(d, 2, 1000, sample_rate=8000)
+        self.assertEqual(list(r['byte']), [0x41])
+        # a glitch shorter than half a bit is not a start bit
+        d = numpy.array([1] * 10 + [0] * 3 + [1] * 100, dtype='uint32')
+        self.assertEqual(len(uart.decode(d, 0, 1000, sample_rate=8000)), 0)
+
+    def test_empty(self):
+        for n in (0, 1):
+            r = uart.decode(
+                numpy.ones(n, dtype='uint32'), 0, 1000, sample_rate=8000)
+            self.assertEqual(len(r), 0)
+            self.assertEqual(
+                r.dtype.names,
+                ('start_sample', 'byte', 'parity_error', 'framing_error'))
+
+    def test_invalid(self):
+        d = line([frame(0x41, 8)])
+        self.assertRaises(ValueError, uart.decode, d, 2, 1000)
+        self.assertRaises(
+            ValueError, uart.decode, d, 2, 1000, sample_rate=8000,
+            parity='mark')
+
+
+if __name__ == '__main__':
+    unittest.main()